@@ -1,3 +1,29 @@
 from django.contrib import admin
+from .models import ContentItem, Delivery, Meme, Recipient
 
-# Register your models here.
+
+@admin.register(Recipient)
+class RecipientAdmin(admin.ModelAdmin):
+    list_display = ('name', 'phone_number', 'latitude', 'longitude', 'timezone', 'send_time', 'active')
+    list_filter = ('active', 'timezone')
+    search_fields = ('name', 'phone_number')
+
+
+@admin.register(Meme)
+class MemeAdmin(admin.ModelAdmin):
+    list_display = ('url', 'size', 'content_type', 'first_seen')
+    search_fields = ('url',)
+
+
+@admin.register(ContentItem)
+class ContentItemAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'text', 'first_seen')
+    list_filter = ('kind',)
+    search_fields = ('text',)
+
+
+@admin.register(Delivery)
+class DeliveryAdmin(admin.ModelAdmin):
+    list_display = ('run', 'phone_number', 'status', 'sid', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('run', 'phone_number', 'sid')
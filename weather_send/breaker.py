@@ -0,0 +1,81 @@
+from django.core.cache import caches
+from weather_send.http_client import provider_config
+from weather_send.metrics import breaker_events
+import requests
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(requests.RequestException):
+    # Raised instead of calling a provider whose breaker is open, so callers
+    # handle it like any other failed request.
+    pass
+
+
+class CircuitBreaker:
+    # Tracks a provider's recent failures, including calls slower than
+    # slow_call_seconds, in the shared content cache so every process and run
+    # sees the same state. breaker_failures failures within breaker_window
+    # seconds open the breaker; after breaker_cooldown seconds one caller is let
+    # through to test the provider, and its outcome closes or reopens it.
+    def __init__(self, provider):
+        self.provider = provider
+        config = provider_config(provider)
+        self.failure_threshold = config['breaker_failures']
+        self.window = config['breaker_window']
+        self.cooldown = config['breaker_cooldown']
+        self.slow_call = config['slow_call_seconds']
+        self.cache = caches['content']
+        self.key = f"breaker:{provider}"
+
+    def load(self):
+        return self.cache.get(self.key) or {'failures': [], 'opened_at': None}
+
+    def state(self):
+        opened_at = self.load()['opened_at']
+        if opened_at is None:
+            return CLOSED
+        if time.time() - opened_at < self.cooldown:
+            return OPEN
+        return HALF_OPEN
+
+    def allow(self):
+        # Returns the state the call should be made in: CLOSED to call as usual,
+        # HALF_OPEN for the one trial call after a cooldown, or OPEN to skip it.
+        state = self.state()
+        if state == HALF_OPEN and not self.cache.add(f"{self.key}:trial", True, self.cooldown):
+            state = OPEN
+        if state == OPEN:
+            breaker_events.inc(provider=self.provider, event='short_circuit')
+        return state
+
+    def record(self, ok, elapsed):
+        state = self.load()
+        if ok and elapsed < self.slow_call:
+            if state['failures'] or state['opened_at'] is not None:
+                self.cache.delete_many([self.key, f"{self.key}:trial"])
+                breaker_events.inc(provider=self.provider, event='closed')
+            return
+
+        now = time.time()
+        failures = [failed_at for failed_at in state['failures'] if now - failed_at < self.window] + [now]
+        opened_at = state['opened_at']
+        if opened_at is not None or len(failures) >= self.failure_threshold:
+            opened_at = now
+            self.cache.delete(f"{self.key}:trial")
+            breaker_events.inc(provider=self.provider, event='opened')
+        self.cache.set(self.key, {'failures': failures, 'opened_at': opened_at}, self.window + self.cooldown)
+
+    def call(self, fetch):
+        # Runs fetch, which returns None on failure, and records the outcome.
+        started = time.perf_counter()
+        try:
+            value = fetch()
+        except Exception:
+            self.record(False, time.perf_counter() - started)
+            raise
+        self.record(value is not None, time.perf_counter() - started)
+        return value
@@ -0,0 +1,60 @@
+from datetime import date
+from django.conf import settings
+from django.core.cache import caches
+from weather_send.breaker import CircuitBreaker, HALF_OPEN, OPEN
+from weather_send.metrics import breaker_events, record_cache
+import threading
+
+
+def daily_key(name):
+    return f"{name}:{date.today().isoformat()}"
+
+
+def stale_key(provider):
+    return f"{provider}:last_good"
+
+
+def cached_daily(name, fetch, stale=True, provider=None):
+    # Content that is the same for every recipient on a given day is fetched
+    # once and shared by every send that morning, across processes. It's
+    # cached under name, and provider, the HTTP_PROVIDERS entry fetch calls,
+    # defaults to it.
+    #
+    # Each provider has a circuit breaker. While it's open the provider isn't
+    # called at all, and with stale=True the last good value is served in its
+    # place. Once the cooldown is over a single background request tests the
+    # provider, still serving the stale value meanwhile.
+    provider = provider or name
+    content_cache = caches['content']
+    key = daily_key(name)
+
+    value = content_cache.get(key)
+    record_cache(name, hit=value is not None)
+    if value is not None:
+        return value
+
+    breaker = CircuitBreaker(provider)
+    state = breaker.allow()
+    last_good = content_cache.get(stale_key(name)) if stale else None
+
+    def refresh():
+        fresh = breaker.call(fetch)
+        if fresh is not None:
+            content_cache.set(key, fresh, settings.CONTENT_CACHE_TTL)
+            content_cache.set(stale_key(name), fresh, settings.STALE_CONTENT_TTL)
+        return fresh
+
+    if state == HALF_OPEN and last_good is not None:
+        # Not a daemon thread: a command exiting right after its send must
+        # still let the trial call finish and be recorded, or its trial claim
+        # would keep the provider skipped for another whole cooldown.
+        threading.Thread(target=refresh, name=f"refresh-{provider}").start()
+    elif state != OPEN:
+        value = refresh()
+        if value is not None:
+            return value
+
+    if last_good is not None:
+        breaker_events.inc(provider=provider, event='stale')
+        print(f"Serving stale {name} content from an earlier fetch.")
+    return last_good
@@ -0,0 +1,69 @@
+from django.conf import settings
+import textwrap
+
+# Rough per-message overhead the chat format adds on top of the content.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    # About four characters per token for English text; close enough for
+    # budgeting without pulling in a tokenizer.
+    return len(text) // 4 + 1
+
+
+def message_tokens(message):
+    return estimate_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS
+
+
+def summarize(messages, max_chars):
+    # Compact older turns into one line per turn, keeping the most recent ones
+    # that fit in max_chars.
+    lines = []
+    used = 0
+    for message in reversed(messages):
+        speaker = "They" if message['role'] == 'user' else "You"
+        line = f"{speaker}: {textwrap.shorten(message['content'], width=100, placeholder='...')}"
+        if used + len(line) + 1 > max_chars:
+            break
+        lines.insert(0, line)
+        used += len(line) + 1
+    return "\n".join(lines)
+
+
+def pack_recent(history, budget):
+    recent = []
+    for message in reversed(history):
+        cost = message_tokens(message)
+        if cost > budget:
+            break
+        recent.insert(0, message)
+        budget -= cost
+    return recent
+
+
+def build_context(system_message, history, token_budget=None, summary_chars=None):
+    # The system message is always first. The most recent turns are packed in
+    # up to the token budget, and anything older is folded into a short summary
+    # so prompt size stays flat however long the conversation gets.
+    token_budget = token_budget or settings.CHAT_CONTEXT_TOKEN_BUDGET
+    summary_chars = summary_chars or settings.CHAT_SUMMARY_MAX_CHARS
+    budget = token_budget - message_tokens(system_message)
+
+    recent = pack_recent(history, budget)
+    if len(recent) < len(history):
+        summary_budget = estimate_tokens('x' * summary_chars) + MESSAGE_OVERHEAD_TOKENS
+        recent = pack_recent(history, budget - summary_budget)
+
+    if not recent and history:
+        # The latest message alone is over budget; send it cut down.
+        latest = history[-1]
+        max_chars = max((budget - MESSAGE_OVERHEAD_TOKENS) * 4, 0)
+        recent = [{"role": latest['role'], "content": latest['content'][:max_chars]}]
+
+    messages = [system_message]
+    older = history[:len(history) - len(recent)]
+    if older:
+        summary = summarize(older, summary_chars)
+        if summary:
+            messages.append({"role": "system", "content": f"Earlier in this conversation:\n{summary}"})
+    return messages + recent
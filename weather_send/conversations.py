@@ -0,0 +1,82 @@
+from collections import OrderedDict, deque
+from django.conf import settings
+from django.db.models import Subquery
+from django.utils import timezone
+from weather_send.models import ConversationMessage, ConversationSender
+import random
+import threading
+
+
+class MemoryConversationStore:
+    # A fixed-size ring buffer of messages per sender. Senders are kept in
+    # least-recently-used order and the idlest is dropped once there are too many.
+    def __init__(self, max_messages, max_senders):
+        self.max_messages = max_messages
+        self.max_senders = max_senders
+        self.histories = OrderedDict()
+        self.lock = threading.Lock()
+
+    def append(self, sender, message):
+        with self.lock:
+            history = self.histories.get(sender)
+            if history is None:
+                history = self.histories[sender] = deque(maxlen=self.max_messages)
+            self.histories.move_to_end(sender)
+            history.append(message)
+            while len(self.histories) > self.max_senders:
+                self.histories.popitem(last=False)
+
+    def history(self, sender):
+        with self.lock:
+            return list(self.histories.get(sender, ()))
+
+
+class DatabaseConversationStore:
+    # Keeps histories in the database so every web worker sees the same
+    # conversation. Trimming keeps the table bounded like the memory store.
+    # Each append costs a fixed three queries: the insert, trimming this
+    # sender's history and bumping their last_active. Idle senders are
+    # trimmed only on one append in SENDER_TRIM_EVERY, on average, so the
+    # table may briefly hold a few more senders than max_senders.
+    SENDER_TRIM_EVERY = 50
+
+    def __init__(self, max_messages, max_senders):
+        self.max_messages = max_messages
+        self.max_senders = max_senders
+
+    def append(self, sender, message):
+        ConversationMessage.objects.create(sender=sender, role=message['role'], content=message['content'])
+
+        oldest_kept = (ConversationMessage.objects.filter(sender=sender).order_by('-id')
+                       .values('id')[self.max_messages - 1:self.max_messages])
+        ConversationMessage.objects.filter(sender=sender, id__lt=Subquery(oldest_kept)).delete()
+
+        ConversationSender.objects.bulk_create(
+            [ConversationSender(sender=sender, last_active=timezone.now())],
+            update_conflicts=True, unique_fields=['sender'], update_fields=['last_active'])
+
+        if random.randrange(self.SENDER_TRIM_EVERY) == 0:
+            self.trim_senders()
+
+    def trim_senders(self):
+        idle_senders = list(ConversationSender.objects.order_by('-last_active')
+                            .values_list('sender', flat=True)[self.max_senders:])
+        if idle_senders:
+            ConversationMessage.objects.filter(sender__in=idle_senders).delete()
+            ConversationSender.objects.filter(sender__in=idle_senders).delete()
+
+    def history(self, sender):
+        messages = (ConversationMessage.objects.filter(sender=sender)
+                    .order_by('-id').values('role', 'content')[:self.max_messages])
+        return [dict(message) for message in reversed(messages)]
+
+
+CONVERSATION_STORES = {
+    'memory': MemoryConversationStore,
+    'database': DatabaseConversationStore,
+}
+
+
+def build_conversation_store():
+    store_class = CONVERSATION_STORES[settings.CONVERSATION_STORE]
+    return store_class(settings.CONVERSATION_MAX_MESSAGES, settings.CONVERSATION_MAX_SENDERS)
@@ -0,0 +1,101 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from weather_send.http_client import get_session, provider_config
+from weather_send.metrics import message_segments, messages_sent, span
+from weather_send.segments import analyze
+import os
+import threading
+import time
+
+SmsResult = namedtuple('SmsResult', ['to', 'sid', 'error'])
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def get_twilio_client():
+    # One client per process so every send reuses the same pooled connection.
+    global _client
+    with _client_lock:
+        if _client is None:
+            # Imported here so commands and web workers that never send don't
+            # pay for loading the Twilio SDK at start-up.
+            from twilio.http.http_client import TwilioHttpClient
+            from twilio.rest import Client
+
+            http_client = TwilioHttpClient(pool_connections=True, timeout=provider_config('twilio')['read_timeout'])
+            # Send through the shared provider session for its pooling, retries
+            # and host overrides.
+            http_client.session = get_session('twilio')
+            _client = Client(os.environ.get('TWILIO_ACCOUNT_SID'), os.environ.get('TWILIO_AUTH_TOKEN'),
+                             http_client=http_client)
+        return _client
+
+
+@span('send_sms')
+def send_message(to, body, media_url=None, bucket=None, from_=None):
+    # from_ defaults to TWILIO_PHONE.
+    from twilio.base.exceptions import TwilioRestException
+
+    client = get_twilio_client()
+    params = {'body': body, 'from_': from_ or os.environ.get('TWILIO_PHONE'), 'to': to}
+    if media_url:
+        params['media_url'] = [media_url]
+
+    for attempt in range(settings.TWILIO_MAX_ATTEMPTS):
+        if bucket:
+            bucket.acquire()
+        try:
+            message = client.messages.create(**params)
+            messages_sent.inc(result='sent')
+            if not media_url:
+                info = analyze(body)
+                message_segments.inc(info.segments, encoding=info.encoding)
+            return SmsResult(to, message.sid, None)
+        except TwilioRestException as e:
+            # A 429 means the account's concurrent API request limit was hit;
+            # back off and retry rather than dropping the message.
+            if e.status != 429 or attempt == settings.TWILIO_MAX_ATTEMPTS - 1:
+                messages_sent.inc(result='failed')
+                return SmsResult(to, None, e)
+            messages_sent.inc(result='rate_limited')
+            time.sleep(2 ** attempt)
+        except Exception as e:
+            messages_sent.inc(result='failed')
+            return SmsResult(to, None, e)
+
+
+def send_messages(messages):
+    # messages is an iterable of (to, body, media_url) tuples. Sends go through
+    # a worker pool paced by a token bucket matching the sender's throughput cap,
+    # and results come back in the same order.
+    messages = list(messages)
+    if not messages:
+        return []
+
+    bucket = TokenBucket(settings.TWILIO_MESSAGES_PER_SECOND)
+    workers = min(settings.TWILIO_DISPATCH_WORKERS, len(messages))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda message: send_message(*message, bucket=bucket), messages))
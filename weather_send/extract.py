@@ -0,0 +1,104 @@
+from html.parser import HTMLParser
+import codecs
+
+MEME_ARTICLE_CLASS = "gallery-item"
+MEME_IMAGE_CLASS = "img-responsive"
+HOLIDAY_TITLE_CLASS = "card-link-title---hover-secondary-1"
+
+
+def has_class(attrs, class_name):
+    for name, value in attrs:
+        if name == 'class' and value and class_name in value.split():
+            return True
+    return False
+
+
+class MemeImageParser(HTMLParser):
+    # Collects the src of every img.img-responsive inside an
+    # article.gallery-item, without building a tree of the rest of the page.
+    def __init__(self, max_results=None):
+        super().__init__(convert_charrefs=True)
+        self.max_results = max_results
+        self.article_depth = 0
+        self.found_in_article = False
+        self.urls = []
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'article':
+            if self.article_depth or has_class(attrs, MEME_ARTICLE_CLASS):
+                self.article_depth += 1
+                if self.article_depth == 1:
+                    self.found_in_article = False
+        elif tag == 'img' and self.article_depth and not self.found_in_article and has_class(attrs, MEME_IMAGE_CLASS):
+            src = dict(attrs).get('src')
+            if src:
+                self.urls.append(src)
+                self.found_in_article = True
+                if self.max_results and len(self.urls) >= self.max_results:
+                    self.done = True
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == 'article' and self.article_depth:
+            self.article_depth -= 1
+
+
+class HolidayTitleParser(HTMLParser):
+    # Captures the text of the first h3 with the holiday title class, then
+    # reports done so the caller can stop reading the page.
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.in_title = False
+        self.parts = []
+        self.title = None
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'h3' and not self.done and has_class(attrs, HOLIDAY_TITLE_CLASS):
+            self.in_title = True
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.parts.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'h3' and self.in_title:
+            self.in_title = False
+            self.title = ''.join(self.parts)
+            self.done = True
+
+
+def charset(content_type):
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            return value.strip('"\'')
+    return None
+
+
+def feed(parser, chunks, encoding=None):
+    # Decode and parse chunk by chunk, stopping as soon as the parser has what
+    # it needs so the rest of the page is never read or parsed.
+    try:
+        decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        if parser.done:
+            break
+    else:
+        parser.feed(decoder.decode(b'', final=True))
+        parser.close()
+    return parser
+
+
+def extract_meme_urls(chunks, encoding=None, max_results=None):
+    return feed(MemeImageParser(max_results), chunks, encoding).urls
+
+
+def extract_holiday_title(chunks, encoding=None):
+    return feed(HolidayTitleParser(), chunks, encoding).title
@@ -0,0 +1,131 @@
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit, urlunsplit
+from urllib3.util.retry import Retry
+from weather_send.metrics import provider_bytes, provider_request_seconds, provider_requests, provider_retries
+import random
+import requests
+import threading
+import time
+
+DEFAULT_PROVIDER_CONFIG = {
+    'connect_timeout': 3.05,
+    'read_timeout': 10,
+    'retries': 2,
+    'backoff_factor': 0.5,
+    'max_retry_after': 10,
+    'pool_maxsize': 10,
+    'slow_call_seconds': 8,
+    'breaker_failures': 3,
+    'breaker_window': 600,
+    'breaker_cooldown': 300,
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class JitteredRetry(Retry):
+    # Full jitter keeps recipients retrying the same provider from lining up.
+    # A provider's Retry-After is honoured only up to max_retry_after seconds,
+    # so a 429 asking for minutes can't stall a send for that long.
+    def __init__(self, *args, provider=None, max_retry_after=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.provider = provider
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kwargs):
+        return super().new(provider=self.provider, max_retry_after=self.max_retry_after, **kwargs)
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None or self.max_retry_after is None:
+            return retry_after
+        return min(retry_after, self.max_retry_after)
+
+    def increment(self, *args, **kwargs):
+        provider_retries.inc(provider=self.provider)
+        return super().increment(*args, **kwargs)
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff else 0
+
+
+class ProviderSession(requests.Session):
+    def __init__(self, provider, timeout):
+        super().__init__()
+        self.provider = provider
+        self.timeout = timeout
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        request.url = rewrite_url(request.url)
+        started = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except requests.RequestException:
+            provider_requests.inc(provider=self.provider, status='error')
+            raise
+        finally:
+            provider_request_seconds.observe(time.perf_counter() - started, provider=self.provider)
+
+        provider_requests.inc(provider=self.provider, status=response.status_code)
+        content_length = response.headers.get('Content-Length', '')
+        if content_length.isdigit():
+            provider_bytes.inc(int(content_length), provider=self.provider)
+        elif not kwargs.get('stream'):
+            provider_bytes.inc(len(response.content), provider=self.provider)
+        return response
+
+
+def rewrite_url(url):
+    # HTTP_HOST_OVERRIDES maps a provider's host to another base URL, such as a
+    # local stand-in server or a proxy.
+    overrides = settings.HTTP_HOST_OVERRIDES
+    if not overrides:
+        return url
+    parts = urlsplit(url)
+    override = overrides.get(parts.netloc)
+    if override is None:
+        return url
+    override = urlsplit(override)
+    return urlunsplit((override.scheme, override.netloc, parts.path, parts.query, parts.fragment))
+
+
+def provider_config(provider):
+    return {**DEFAULT_PROVIDER_CONFIG, **settings.HTTP_PROVIDERS.get(provider, {})}
+
+
+def provider_timeout(provider):
+    config = provider_config(provider)
+    return config['connect_timeout'], config['read_timeout']
+
+
+def build_session(provider):
+    config = provider_config(provider)
+    session = ProviderSession(provider, timeout=provider_timeout(provider))
+    retry = JitteredRetry(
+        provider=provider,
+        max_retry_after=config['max_retry_after'],
+        total=config['retries'],
+        backoff_factor=config['backoff_factor'],
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_maxsize=config['pool_maxsize'], max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(provider):
+    # One session per provider, shared by every thread in the process, so
+    # connections and TLS sessions are reused across calls.
+    with _sessions_lock:
+        if provider not in _sessions:
+            _sessions[provider] = build_session(provider)
+        return _sessions[provider]
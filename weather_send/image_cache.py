@@ -0,0 +1,82 @@
+from concurrent.futures import Future
+from django.conf import settings
+from .metrics import record_cache
+from pathlib import Path
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+
+def image_key(prompt, size):
+    normalized = re.sub(r'\s+', ' ', prompt.strip().lower())
+    return hashlib.sha256(f"{size}|{normalized}".encode('utf-8')).hexdigest()
+
+
+class ImageCache:
+    # Images stored on disk under a hash key, such as one of a generated image's
+    # normalized prompt and size. Repeats are served from disk, concurrent
+    # identical requests share one generation, and the least recently used
+    # files are evicted once the directory grows past max_bytes.
+    def __init__(self, directory, max_bytes, suffix='.png', name='image'):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.name = name
+        self.lock = threading.Lock()
+        self.in_flight = {}
+
+    def path(self, key):
+        return self.directory / f"{key}{self.suffix}"
+
+    def get_or_generate(self, prompt, size, generate):
+        return self.get_or_create(image_key(prompt, size), generate)
+
+    def get_or_create(self, key, generate):
+        path = self.path(key)
+        if path.exists():
+            record_cache(self.name, hit=True)
+            os.utime(path)
+            return key
+        record_cache(self.name, hit=False)
+
+        with self.lock:
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            self.store(path, generate())
+            future.set_result(key)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+        self.evict()
+        return key
+
+    def store(self, path, data):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
+
+    def evict(self):
+        files = [(path.stat().st_mtime, path.stat().st_size, path) for path in self.directory.glob(f'*{self.suffix}')]
+        total_bytes = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total_bytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_bytes -= size
+
+
+image_cache = ImageCache(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_BYTES)
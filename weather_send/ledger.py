@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+from weather_send.dispatch import get_twilio_client, send_messages
+from weather_send.models import Delivery
+import hashlib
+import os
+
+
+def body_hash(body):
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def send_key(run, phone_number):
+    return hashlib.sha256(f"{run}|{phone_number}".encode('utf-8')).hexdigest()
+
+
+def default_run(command, body=None):
+    # One run per command and day, and per message when the body is fixed up
+    # front, so an accidental rerun finds the earlier one.
+    run = f"{command}:{date.today().isoformat()}"
+    return f"{run}:{body_hash(body)[:12]}" if body is not None else run
+
+
+def run_exists(run):
+    return Delivery.objects.filter(run=run).exists()
+
+
+# Allowance for our clock running ahead of Twilio's when matching its log.
+CLOCK_SKEW = timedelta(minutes=5)
+
+
+def find_sent_message(delivery):
+    # A pending row means a run died between handing the message to Twilio and
+    # recording the outcome, or the outcome was unclear. Look for it in
+    # Twilio's log before sending again. Twilio only filters on date_sent,
+    # which a still-queued message doesn't have yet, so the latest messages
+    # to the number are matched on date_created here instead.
+    client = get_twilio_client()
+    messages = client.messages.list(to=delivery.phone_number, from_=os.environ.get('TWILIO_PHONE'), limit=20)
+    for message in messages:
+        if message.date_created and message.date_created < delivery.created_at - CLOCK_SKEW:
+            continue
+        if message.body and body_hash(message.body) == delivery.body_hash:
+            return message.sid
+    return None
+
+
+def send_batch(run, messages):
+    # Sends (to, body, media_url) messages under the run's ledger and returns
+    # (delivery, result) pairs in order. Recipients already sent to in this run
+    # are skipped with a result of None, as are pending ones whose earlier
+    # attempt can't be ruled out.
+    deliveries = []
+    for to, body, media_url in messages:
+        delivery, created = Delivery.objects.get_or_create(
+            key=send_key(run, to), defaults={'run': run, 'phone_number': to, 'body_hash': body_hash(body)})
+        if not created and delivery.status == Delivery.PENDING:
+            try:
+                sid = find_sent_message(delivery)
+            except Exception as e:
+                delivery.error = f"Couldn't check for an earlier send: {e}"
+                delivery.save(update_fields=['error', 'updated_at'])
+                deliveries.append((delivery, None))
+                continue
+            if sid:
+                delivery.sid, delivery.status, delivery.error = sid, Delivery.SENT, ''
+                delivery.save(update_fields=['sid', 'status', 'error', 'updated_at'])
+        if delivery.status == Delivery.SENT:
+            deliveries.append((delivery, None))
+            continue
+
+        delivery.body_hash, delivery.status = body_hash(body), Delivery.PENDING
+        delivery.save(update_fields=['body_hash', 'status', 'updated_at'])
+        deliveries.append((delivery, (to, body, media_url)))
+
+    from twilio.base.exceptions import TwilioRestException
+
+    results = iter(send_messages(message for _, message in deliveries if message))
+    outcomes = []
+    for delivery, message in deliveries:
+        if message is None:
+            outcomes.append((delivery, None))
+            continue
+        result = next(results)
+        if isinstance(result.error, TwilioRestException):
+            delivery.status, delivery.error = Delivery.FAILED, str(result.error)
+        elif result.error:
+            # Anything else, like a read timeout, leaves it unknown whether
+            # Twilio took the message, so it stays pending and a resume checks
+            # Twilio's log before sending it again.
+            delivery.error = str(result.error)
+        else:
+            delivery.status, delivery.sid, delivery.error = Delivery.SENT, result.sid, ''
+        delivery.save(update_fields=['status', 'sid', 'error', 'updated_at'])
+        outcomes.append((delivery, result))
+    return outcomes
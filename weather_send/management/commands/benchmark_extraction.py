@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand
+from pathlib import Path
+from weather_send.extract import extract_holiday_title, extract_meme_urls
+from weather_send.http_client import get_session
+from weather_send.morning import PAGE_CHUNK_SIZE
+from weather_send.standins import holiday_page, memedroid_page
+import statistics
+import time
+import tracemalloc
+
+# The pages shipped here follow the live pages' markup and size; --save
+# replaces them with current copies.
+PAGES_DIR = Path(__file__).resolve().parents[2] / 'fixtures' / 'pages'
+MEMEDROID_URL = "https://www.memedroid.com/memes/top/day"
+HOLIDAY_URL = "https://www.holidaycalendar.io/what-holiday-is-today"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+
+def soup_meme_urls(page):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(page, 'html.parser')
+    meme_urls = []
+    for article in soup.find_all("article", class_="gallery-item"):
+        meme_img = article.find("img", class_="img-responsive")
+        if meme_img and meme_img.get('src'):
+            meme_urls.append(meme_img['src'])
+    return meme_urls
+
+
+def soup_holiday_title(page):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(page, 'html.parser')
+    holiday_title_h3 = soup.find("h3", {"class": "card-link-title---hover-secondary-1"})
+    return holiday_title_h3.text if holiday_title_h3 is not None else None
+
+
+def chunked(page):
+    return (page[i:i + PAGE_CHUNK_SIZE] for i in range(0, len(page), PAGE_CHUNK_SIZE))
+
+
+# Saved page name -> (live URL, stand-in page, full BeautifulSoup tree, streaming extraction)
+PAGES = {
+    'memedroid.html': (MEMEDROID_URL, memedroid_page, soup_meme_urls,
+                       lambda page: extract_meme_urls(chunked(page))),
+    'holidaycalendar.html': (HOLIDAY_URL, holiday_page, soup_holiday_title,
+                             lambda page: extract_holiday_title(chunked(page))),
+}
+
+
+class Command(BaseCommand):
+    help = ('Compares parse time and peak memory of the streaming extractors against a full BeautifulSoup parse '
+            'on saved pages')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages-dir', type=Path, default=PAGES_DIR, help='Directory holding the saved pages')
+        parser.add_argument('--save', action='store_true', help='Download the live pages into --pages-dir first')
+        parser.add_argument('--runs', type=int, default=20, help='Parses per approach when timing')
+
+    def save_pages(self, pages_dir):
+        pages_dir.mkdir(parents=True, exist_ok=True)
+        for name, (url, _, _, _) in PAGES.items():
+            response = get_session('benchmark').get(url, headers={"User-Agent": USER_AGENT})
+            response.raise_for_status()
+            (pages_dir / name).write_bytes(response.content)
+            self.stdout.write(f"Saved {url} to {pages_dir / name}")
+
+    def measure(self, parse, page, runs):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = parse(page)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        parse(page)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, statistics.median(timings), peak / 1024
+
+    def handle(self, *args, **kwargs):
+        pages_dir = kwargs['pages_dir']
+        if kwargs['save']:
+            self.save_pages(pages_dir)
+
+        for name, (_, stand_in, soup_parse, streaming_parse) in PAGES.items():
+            if (pages_dir / name).exists():
+                page = (pages_dir / name).read_bytes()
+            else:
+                # Only if the saved pages have been removed: the small stand-in
+                # page the offline benchmark serves is parsed instead.
+                self.stdout.write(self.style.WARNING(
+                    f"No saved {name} in {pages_dir}; using the stand-in page. Run with --save to download it."))
+                page = stand_in().encode('utf-8')
+            soup_result, soup_ms, soup_kb = self.measure(soup_parse, page, kwargs['runs'])
+            streaming_result, streaming_ms, streaming_kb = self.measure(streaming_parse, page, kwargs['runs'])
+
+            self.stdout.write(f"{name} ({len(page) / 1024:.0f} KiB)")
+            self.stdout.write(f"  BeautifulSoup: {soup_ms:8.2f} ms median, {soup_kb:9.0f} KiB peak")
+            self.stdout.write(f"  Streaming:     {streaming_ms:8.2f} ms median, {streaming_kb:9.0f} KiB peak")
+            if soup_result != streaming_result:
+                self.stdout.write(self.style.WARNING(f"  Results differ: {soup_result!r} vs {streaming_result!r}"))
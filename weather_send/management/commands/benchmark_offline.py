@@ -0,0 +1,205 @@
+from collections import defaultdict
+from contextlib import ExitStack, redirect_stdout
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from pathlib import Path
+from unittest import mock
+from weather_send.standins import PROVIDER_HOSTS, StandIns, StandInConfig
+import functools
+import io
+import os
+import tempfile
+import time
+
+SCENARIOS = ['send_text1', 'send_text2', 'custom_text', 'send_morning_texts', 'sms_reply']
+
+# Stand-in credentials and recipients, so nothing real can be reached or texted.
+BENCHMARK_ENV = {
+    'TWILIO_ACCOUNT_SID': 'AC' + '0' * 32,
+    'TWILIO_AUTH_TOKEN': 'standin',
+    'TWILIO_PHONE': '+15005550006',
+    'WEATHER_API_KEY': 'standin',
+    'NINJA_API_KEY': 'standin',
+    'OPENAI_API_KEY': 'standin',
+    'PUSHOVER_APP_TOKEN': 'standin',
+    'PUSHOVER_USER_KEY': 'standin',
+    'LAT1': '40.7128', 'LON1': '-74.0060',
+    'LAT2': '34.0522', 'LON2': '-118.2437',
+    'RECIPIENT_PHONE1': '+15005550001', 'RECIPIENT_NAME1': 'Ada',
+    'RECIPIENT_PHONE2': '+15005550002',
+    'RECIPIENT_PHONE3': '+15005550003', 'RECIPIENT_NAME3': 'Grace',
+    'RECIPIENT_PHONE4': '+15005550004', 'RECIPIENT_NAME4': 'Linus',
+}
+
+SMS_PROMPTS = ['hi', 'thanks', 'tell me a joke', 'what should I have for lunch?', 'image a cat wearing a hat']
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(p / 100 * (len(values) - 1)))]
+
+
+class Command(BaseCommand):
+    help = ('Runs the morning texts, custom_text and sms_reply against local stand-ins for every provider '
+            'and reports per-stage and end-to-end latency percentiles')
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', help=f"Scenarios to run (default: {' '.join(SCENARIOS)})")
+        parser.add_argument('--runs', type=int, default=10, help='Runs per scenario')
+        parser.add_argument('--latency', type=float, default=50, help='Stand-in response latency in ms')
+        parser.add_argument('--jitter', type=float, default=10, help='Random +/- latency jitter in ms')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of stand-in responses that are 503s')
+        parser.add_argument('--provider-latency', action='append', default=[], metavar='PROVIDER=MS',
+                            help=f"Latency for one provider ({', '.join(PROVIDER_HOSTS)}); repeatable")
+        parser.add_argument('--recipients', type=int, default=25, help='Recipients for send_morning_texts')
+        parser.add_argument('--messages-per-second', type=float,
+                            help='Twilio send rate to simulate (default: TWILIO_MESSAGES_PER_SECOND)')
+        parser.add_argument('--warm', action='store_true', help='Keep caches between runs instead of starting cold')
+
+    def stand_in_configs(self, kwargs):
+        default = StandInConfig(kwargs['latency'] / 1000, kwargs['jitter'] / 1000, kwargs['failure_rate'])
+        configs = {}
+        for override in kwargs['provider_latency']:
+            provider, _, latency = override.partition('=')
+            if provider not in PROVIDER_HOSTS or not latency:
+                raise CommandError(f"Expected PROVIDER=MS with one of {', '.join(PROVIDER_HOSTS)}, got {override!r}")
+            configs[provider] = StandInConfig(float(latency) / 1000, default.jitter, default.failure_rate)
+        return configs, default
+
+    def timed_stages(self, samples):
+        # Wrap the main steps of each flow so every run records how long they
+        # took. Stages that run on several threads report their summed time.
+        from weather_send import dispatch, morning, views
+        from weather_send.management.commands import send_text2
+
+        stages = [
+            (morning.MorningTextCommand, 'fetch_content', 'fetch'),
+            (morning.MorningTextCommand, 'render_body', 'render'),
+            (morning.MorningTextCommand, 'find_fitting_meme', 'meme_fit'),
+            (send_text2.Command, 'fetch_weather_and_uv', 'fetch'),
+            (views, 'generate_ai_response', 'ai_reply'),
+            (dispatch, 'send_message', 'send'),
+            (morning, 'send_message', 'send'),
+            (views, 'send_message', 'send'),
+        ]
+        patches = []
+        for target, attribute, stage in stages:
+            original = getattr(target, attribute)
+
+            def wrapper(*args, _original=original, _stage=stage, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return _original(*args, **kwargs)
+                finally:
+                    samples[-1][_stage] += (time.perf_counter() - started) * 1000
+
+            patches.append(mock.patch.object(target, attribute, functools.wraps(original)(wrapper)))
+        return patches
+
+    def reset(self):
+        from weather_send.models import ContentItem, Meme
+        from weather_send.reply_cache import reply_cache
+
+        caches['content'].clear()
+        with reply_cache.lock:
+            reply_cache.entries.clear()
+        Meme.objects.all().delete()
+        ContentItem.objects.all().delete()
+
+    def run_scenario(self, scenario, run):
+        if scenario == 'custom_text':
+            call_command('custom_text', 'Benchmark message', run=f"benchmark:{scenario}:{run}")
+        elif scenario == 'sms_reply':
+            prompt = SMS_PROMPTS[run % len(SMS_PROMPTS)]
+            response = Client().post('/sms/', {'Body': prompt, 'From': BENCHMARK_ENV['RECIPIENT_PHONE1']})
+            if response.status_code != 200:
+                raise CommandError(f"sms_reply returned {response.status_code}")
+        elif scenario == 'send_text2':
+            call_command('send_text2', run=f"benchmark:{scenario}:{run}")
+        else:
+            call_command(scenario)
+
+    def handle(self, *args, **kwargs):
+        from weather_send.image_cache import image_cache
+        from weather_send.media import meme_cache
+        from weather_send.models import Recipient
+        from weather_send.notify import notifier
+
+        scenarios = kwargs['scenarios'] or SCENARIOS
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        configs, default = self.stand_in_configs(kwargs)
+
+        os.environ.update(BENCHMARK_ENV)
+        os.environ['NO_PROXY'] = ','.join(filter(None, [os.environ.get('NO_PROXY'), '127.0.0.1']))
+
+        with ExitStack() as stack:
+            temp_dir = stack.enter_context(tempfile.TemporaryDirectory())
+            stand_ins = stack.enter_context(StandIns(configs, default))
+            if kwargs['messages_per_second']:
+                stack.enter_context(override_settings(TWILIO_MESSAGES_PER_SECOND=kwargs['messages_per_second']))
+            stack.enter_context(override_settings(
+                HTTP_HOST_OVERRIDES=stand_ins.host_overrides,
+                PUBLIC_BASE_URL='http://testserver/',
+                MEME_TRANSCODE=True,
+                CACHES={
+                    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                    'content': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                'LOCATION': os.path.join(temp_dir, 'content')},
+                },
+            ))
+            stack.enter_context(mock.patch.object(image_cache, 'directory', Path(temp_dir) / 'images'))
+            stack.enter_context(mock.patch.object(meme_cache, 'directory', Path(temp_dir) / 'memes'))
+
+            # A throwaway database, so benchmark recipients and memes never mix
+            # with real data. It's a file rather than SQLite's shared in-memory
+            # database, whose table locks fail at once instead of waiting, so
+            # background reservoir refills behave as they do in production.
+            stack.enter_context(mock.patch.dict(connection.settings_dict['TEST'],
+                                                NAME=os.path.join(temp_dir, 'benchmark.sqlite3')))
+            old_config = setup_databases(verbosity=0, interactive=False)
+            stack.callback(teardown_databases, old_config, verbosity=0)
+            for i in range(kwargs['recipients']):
+                Recipient.objects.create(name=f"Recipient {i}", phone_number=f"+1500555{i:04d}",
+                                         latitude=40.7 + (i % 5) * 0.5, longitude=-74.0 - (i % 5) * 0.5)
+
+            samples = []
+            for patch in self.timed_stages(samples):
+                stack.enter_context(patch)
+
+            for scenario in scenarios:
+                provider_samples = defaultdict(list)
+                failures = 0
+                samples.clear()
+                for run in range(kwargs['runs']):
+                    if not kwargs['warm']:
+                        self.reset()
+                    samples.append(defaultdict(float))
+                    seen_before = len(stand_ins.requests_seen)
+                    started = time.perf_counter()
+                    try:
+                        with redirect_stdout(io.StringIO()):
+                            self.run_scenario(scenario, run)
+                    except Exception as e:
+                        failures += 1
+                        self.stdout.write(self.style.ERROR(f"{scenario} run {run + 1} failed: {e}"))
+                    samples[-1]['end_to_end'] = (time.perf_counter() - started) * 1000
+                    for provider, elapsed_ms in stand_ins.requests_seen[seen_before:]:
+                        provider_samples[provider].append(elapsed_ms)
+                self.report(scenario, samples, provider_samples, failures)
+
+            notifier.flush()
+
+    def report(self, scenario, samples, provider_samples, failures):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{scenario}: {len(samples)} runs, {failures} failed"))
+        self.stdout.write(f"  {'stage':<24}{'p50':>10}{'p90':>10}{'p99':>10}   (ms)")
+        stages = ['end_to_end'] + sorted({stage for sample in samples for stage in sample} - {'end_to_end'})
+        rows = [(stage, [sample.get(stage, 0.0) for sample in samples]) for stage in stages]
+        rows += [(f"provider:{provider}", values) for provider, values in sorted(provider_samples.items())]
+        for name, values in rows:
+            self.stdout.write(f"  {name:<24}" + ''.join(f"{percentile(values, p):>10.1f}" for p in (50, 90, 99)))
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_TARGETS = ['send_text1', 'send_text2', 'send_morning_texts', 'custom_text', 'wsgi']
+HEAVY_MODULES = ('twilio', 'bs4', 'openai', 'requests')
+
+# Boots a web worker the way gunicorn does and resolves the URLconf, which is
+# what the first request would otherwise pay for.
+WSGI_BOOT = ("import weathercollector.wsgi; "
+             "from django.urls import get_resolver; get_resolver().url_patterns")
+
+
+class Command(BaseCommand):
+    help = 'Measures process start-up, Django bootstrap and import cost for each management command and the WSGI app'
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', help=f"Commands to measure, or 'wsgi' (default: {' '.join(DEFAULT_TARGETS)})")
+        parser.add_argument('--runs', type=int, default=5, help='Fresh processes started per target')
+
+    def target_args(self, target):
+        if target == 'wsgi':
+            return [sys.executable, '-X', 'importtime', '-c', WSGI_BOOT]
+        # --help loads settings, sets up Django and imports the command module
+        # without running it.
+        return [sys.executable, '-X', 'importtime', str(settings.BASE_DIR / 'manage.py'), target, '--help']
+
+    def heavy_imports(self, importtime_output):
+        # Lines look like "import time: self | cumulative | package", children
+        # first and indented under the module that imported them. Walking them
+        # in reverse puts each parent before its children, so a heavy package is
+        # only counted where it was first pulled in and not again for its own
+        # submodules.
+        entries = []
+        for line in importtime_output.splitlines():
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            _, cumulative, name = line.split('|')
+            if not cumulative.strip().isdigit():
+                continue
+            depth = len(name) - len(name.lstrip())
+            entries.append((depth, name.strip(), int(cumulative) / 1000))
+
+        imported = {}
+        ancestors = []
+        for depth, name, cumulative_ms in reversed(entries):
+            while ancestors and ancestors[-1][0] >= depth:
+                ancestors.pop()
+            package = name.split('.')[0]
+            if package in HEAVY_MODULES and all(parent != package for _, parent in ancestors):
+                imported[package] = imported.get(package, 0) + cumulative_ms
+            ancestors.append((depth, package))
+        return imported
+
+    def handle(self, *args, **kwargs):
+        targets = kwargs['targets'] or DEFAULT_TARGETS
+        for target in targets:
+            timings = []
+            heavy = {}
+            for _ in range(kwargs['runs']):
+                start = time.perf_counter()
+                result = subprocess.run(self.target_args(target), cwd=settings.BASE_DIR,
+                                        capture_output=True, text=True)
+                timings.append((time.perf_counter() - start) * 1000)
+                if result.returncode != 0:
+                    self.stdout.write(self.style.ERROR(f"{target} failed: {result.stderr.strip().splitlines()[-1]}"))
+                    break
+                heavy = self.heavy_imports(result.stderr)
+            else:
+                heavy_report = ', '.join(f"{name} {ms:.0f} ms" for name, ms in sorted(heavy.items())) or 'none'
+                self.stdout.write(
+                    f"{target}: median {statistics.median(timings):.0f} ms, min {min(timings):.0f} ms "
+                    f"over {len(timings)} runs; heavy imports: {heavy_report}")
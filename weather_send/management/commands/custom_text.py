@@ -1,32 +1,41 @@
-from django.core.management.base import BaseCommand
-from twilio.rest import Client
+from django.core.management.base import CommandError
+from weather_send.ledger import default_run, run_exists, send_batch
+from weather_send.metrics import MeasuredCommand
+from weather_send.models import Delivery
+from weather_send.segments import describe
 import os
 
-class Command(BaseCommand):
+class Command(MeasuredCommand):
     help = 'Send a text to multiple phone numbers at once'
 
     def add_arguments(self, parser):
         parser.add_argument('message', type=str, help='The message to send')
+        parser.add_argument('--run', help='Name of this send in the delivery ledger (default: per message and day)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue an earlier run, sending only to recipients it did not reach')
 
     def handle(self, *args, **kwargs):
-        account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
-        auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
-        twilio_phone_number = os.environ.get('TWILIO_PHONE')
-
         phone_numbers = [
             os.environ.get('RECIPIENT_PHONE1'),
             os.environ.get('RECIPIENT_PHONE3'),
             os.environ.get('RECIPIENT_PHONE4'),
         ]
 
-        client = Client(account_sid, auth_token)
         message_text = kwargs['message']
+        self.stdout.write(f"Message is {describe(message_text)}.")
+
+        run = kwargs['run'] or default_run('custom_text', message_text)
+        if run_exists(run) and not kwargs['resume']:
+            raise CommandError(f"Run {run} was already sent; pass --resume to retry only its undelivered recipients.")
 
-        for number in phone_numbers:
-            if number:
-                client.messages.create(
-                    body=message_text,
-                    from_=twilio_phone_number,
-                    to=number
-                )
-                self.stdout.write(self.style.SUCCESS(f"Message sent to {number}"))
\ No newline at end of file
+        outcomes = send_batch(run, [(number, message_text, None) for number in phone_numbers if number])
+        for delivery, result in outcomes:
+            if result is None and delivery.status == Delivery.SENT:
+                self.stdout.write(f"Already sent to {delivery.phone_number}")
+            elif result is None:
+                self.stdout.write(self.style.WARNING(
+                    f"Skipped {delivery.phone_number}, an earlier attempt may have been sent: {delivery.error}"))
+            elif result.error:
+                self.stdout.write(self.style.ERROR(f"Failed to send to {result.to}: {result.error}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Message sent to {result.to}"))
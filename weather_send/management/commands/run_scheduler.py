@@ -0,0 +1,198 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import close_old_connections
+from weather_send.dispatch import send_messages
+from weather_send.models import Recipient
+from weather_send.morning import MorningTextCommand
+from weather_send.notify import send_pushover_notification
+from weather_send.segments import describe
+from zoneinfo import ZoneInfo
+import heapq
+import time
+import traceback
+
+
+def next_send_time(recipient, after):
+    # The next moment after `after` (UTC) that it's send_time on the recipient's
+    # wall clock, so sends follow their local mornings through DST changes.
+    zone = ZoneInfo(recipient.timezone)
+    day = after.astimezone(zone).date()
+    while True:
+        send_at = datetime.combine(day, recipient.send_time, tzinfo=zone).astimezone(dt_timezone.utc)
+        if send_at > after:
+            return send_at
+        day += timedelta(days=1)
+
+
+class Command(MorningTextCommand):
+    help = ('Runs continuously, sending each active recipient their morning text at their own send time '
+            'and preparing it a few minutes ahead')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefetch-minutes', type=float,
+                            help='Minutes ahead of each send to prepare it (default: SCHEDULER_PREFETCH_MINUTES)')
+
+    def handle(self, *args, **kwargs):
+        prefetch_minutes = kwargs['prefetch_minutes']
+        if prefetch_minutes is None:
+            prefetch_minutes = settings.SCHEDULER_PREFETCH_MINUTES
+        self.lead = timedelta(minutes=prefetch_minutes)
+
+        # Two heaps of (when, recipient id): one for preparing texts, one for
+        # sending them. Entries left behind by rescheduling are skipped when
+        # popped, as they no longer match self.scheduled.
+        self.recipients = {}
+        self.scheduled = {}
+        self.prepared = {}
+        self.prefetch_queue = []
+        self.send_queue = []
+
+        next_reload = 0
+        while True:
+            if time.monotonic() >= next_reload:
+                close_old_connections()
+                self.guarded(self.reload)
+                next_reload = time.monotonic() + settings.SCHEDULER_RELOAD_SECONDS
+
+            now = datetime.now(dt_timezone.utc)
+            self.guarded(self.send_due, now)
+            self.guarded(self.prepare_due, now)
+
+            wake_at = min([entry[0] for entry in self.send_queue[:1] + self.prefetch_queue[:1]],
+                          default=now + timedelta(seconds=settings.SCHEDULER_RELOAD_SECONDS))
+            sleep = min((wake_at - datetime.now(dt_timezone.utc)).total_seconds(),
+                        next_reload - time.monotonic())
+            if sleep > 0:
+                time.sleep(sleep)
+
+    def guarded(self, step, *args):
+        # A failed step is logged and the loop carries on. Ending the scheduler
+        # would cost more than the one batch: once restarted it schedules
+        # everyone whose send time had just passed for tomorrow.
+        try:
+            step(*args)
+        except Exception:
+            self.stdout.write(self.style.ERROR(f"{step.__name__} failed:\n{traceback.format_exc()}"))
+            close_old_connections()
+
+    def reload(self):
+        recipients = {r.id: r for r in Recipient.objects.filter(active=True)}
+        now = datetime.now(dt_timezone.utc)
+
+        removed = set(self.scheduled) - set(recipients)
+        for recipient_id in removed:
+            del self.scheduled[recipient_id]
+            self.prepared.pop(recipient_id, None)
+        changed = bool(removed)
+        for recipient_id, recipient in recipients.items():
+            previous = self.recipients.get(recipient_id)
+            if (recipient_id in self.scheduled and previous.timezone == recipient.timezone
+                    and previous.send_time == recipient.send_time):
+                continue
+            self.prepared.pop(recipient_id, None)
+            try:
+                self.schedule(recipient, now)
+            except (ValueError, KeyError) as e:
+                # An unknown timezone set outside the admin's validation.
+                self.stdout.write(self.style.ERROR(f"Can't schedule {recipient}: {e!r}"))
+                self.scheduled.pop(recipient_id, None)
+                continue
+            changed = True
+        self.recipients = recipients
+
+        if changed and self.scheduled:
+            upcoming = min(self.scheduled.values())
+            self.stdout.write(f"{len(self.scheduled)} recipients scheduled; next send at {upcoming.isoformat()}.")
+
+    def schedule(self, recipient, after):
+        send_at = next_send_time(recipient, after)
+        self.scheduled[recipient.id] = send_at
+        heapq.heappush(self.prefetch_queue, (send_at - self.lead, recipient.id))
+        heapq.heappush(self.send_queue, (send_at, recipient.id))
+
+    def pop_due(self, queue, now):
+        due = []
+        while queue and queue[0][0] <= now:
+            when, recipient_id = heapq.heappop(queue)
+            send_at = when + self.lead if queue is self.prefetch_queue else when
+            if self.scheduled.get(recipient_id) == send_at:
+                due.append(recipient_id)
+        return due
+
+    def prepare_due(self, now):
+        due = [recipient_id for recipient_id in self.pop_due(self.prefetch_queue, now)
+               if recipient_id not in self.prepared]
+        if due:
+            self.prepare([self.recipients[recipient_id] for recipient_id in due])
+
+    def prepare(self, recipients):
+        # Fetch and render everything these recipients need ahead of time. The
+        # shared content lands in the daily cache, so later batches reuse it.
+        close_old_connections()
+        content = self.fetch_content([(r.latitude, r.longitude) for r in recipients],
+                                     [r.phone_number for r in recipients])
+
+        bodies = {}
+        for recipient in recipients:
+            try:
+                local_day = self.scheduled[recipient.id].astimezone(ZoneInfo(recipient.timezone))
+                weather = content['weather'][(recipient.latitude, recipient.longitude)]
+                body = self.render_body(recipient.name, content, weather, day=local_day)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Failed to prepare the text for {recipient}: {e!r}"))
+                continue
+            if body:
+                bodies[recipient] = body
+            else:
+                self.stdout.write(self.style.ERROR(f"Missing weather data for {recipient}, skipping."))
+        if not bodies:
+            return
+
+        longest_body = max(bodies.values(), key=lambda body: len(body.encode('utf-8')))
+        meme_url = self.find_fitting_meme(longest_body, content['meme_urls'], [r.phone_number for r in bodies])
+        if not meme_url:
+            self.stdout.write(self.style.ERROR('Unable to find a suitable meme that fits within the size limit.'))
+            return
+        for recipient, body in bodies.items():
+            self.prepared[recipient.id] = (self.scheduled[recipient.id], body, meme_url, content['items'])
+
+    def send_due(self, now):
+        due = [self.recipients[recipient_id] for recipient_id in self.pop_due(self.send_queue, now)]
+        if not due:
+            return
+
+        # Whatever happens to this batch, its recipients are due again tomorrow.
+        try:
+            self.send(due)
+        finally:
+            for recipient in due:
+                self.schedule(recipient, self.scheduled[recipient.id])
+
+    def send(self, due):
+        # A recipient whose prefetch was missed, e.g. because the scheduler
+        # started inside the lead time, is prepared on the spot.
+        unprepared = [r for r in due if self.prepared.get(r.id, (None,))[0] != self.scheduled[r.id]]
+        if unprepared:
+            self.guarded(self.prepare, unprepared)
+
+        ready = [(r, self.prepared.pop(r.id)) for r in due if r.id in self.prepared]
+        results = send_messages((r.phone_number, body, self.media_url(meme_url))
+                                for r, (_, body, meme_url, _) in ready)
+
+        close_old_connections()
+        for (recipient, (_, body, meme_url, items)), result in zip(ready, results):
+            if result.error:
+                self.stdout.write(self.style.ERROR(f"Failed to send to {recipient}: {result.error}"))
+                continue
+            self.stdout.write(self.style.SUCCESS(f"Successfully sent to {recipient} ({describe(body, meme_url)})."))
+            try:
+                self.record_meme_delivery(meme_url, recipient.phone_number)
+                self.record_content_delivery(items, recipient.phone_number)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Failed to record what was sent to {recipient}: {e!r}"))
+        if ready:
+            send_pushover_notification(f"Daily Update sent to {len(ready)} recipients: "
+                                       f"{', '.join(r.name for r, _ in ready)}")
+            # The scheduler never exits on its own, so each batch is reported
+            # as a run of its own.
+            self.report_metrics()
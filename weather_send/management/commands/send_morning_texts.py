@@ -0,0 +1,47 @@
+from weather_send.dispatch import send_messages
+from weather_send.models import Recipient
+from weather_send.morning import MorningTextCommand
+from weather_send.notify import send_pushover_notification
+from weather_send.segments import describe
+
+
+class Command(MorningTextCommand):
+    help = 'Fetches the day\'s content once and sends the morning text to every active recipient'
+
+    def handle(self, *args, **kwargs):
+        recipients = list(Recipient.objects.filter(active=True))
+        if not recipients:
+            self.stdout.write(self.style.WARNING('No active recipients.'))
+            return
+
+        content = self.fetch_content([(r.latitude, r.longitude) for r in recipients],
+                                     [r.phone_number for r in recipients])
+
+        bodies = {}
+        for recipient in recipients:
+            body = self.render_body(recipient.name, content, content['weather'][(recipient.latitude, recipient.longitude)])
+            if body:
+                bodies[recipient] = body
+            else:
+                self.stdout.write(self.style.ERROR(f"Missing weather data for {recipient}, skipping."))
+        if not bodies:
+            return
+
+        # Every recipient gets the same meme, so size it against the longest body.
+        longest_body = max(bodies.values(), key=lambda body: len(body.encode('utf-8')))
+        meme_url = self.find_fitting_meme(longest_body, content['meme_urls'], [r.phone_number for r in bodies])
+        if not meme_url:
+            self.stdout.write(self.style.ERROR('Unable to find a suitable meme that fits within the size limit.'))
+            return
+
+        media_url = self.media_url(meme_url)
+        results = send_messages((recipient.phone_number, body, media_url) for recipient, body in bodies.items())
+        for recipient, result in zip(bodies, results):
+            if result.error:
+                self.stdout.write(self.style.ERROR(f"Failed to send to {recipient}: {result.error}"))
+            else:
+                self.record_meme_delivery(meme_url, recipient.phone_number)
+                self.record_content_delivery(content['items'], recipient.phone_number)
+                self.stdout.write(self.style.SUCCESS(f"Successfully sent to {recipient} ({describe(bodies[recipient], meme_url)})."))
+
+        send_pushover_notification(f"Daily Update sent to {len(bodies)} recipients: {', '.join(r.name for r in bodies)}")
@@ -1,25 +1,32 @@
-from django.core.management.base import BaseCommand
-from twilio.rest import Client
+from django.core.management.base import CommandError
 import os
 import requests
-from weather_send.views import send_pushover_notification
+from weather_send.ledger import default_run, run_exists, send_batch
+from weather_send.metrics import MeasuredCommand, span
+from weather_send.models import Delivery
+from weather_send.weather import fetch_daily_forecast
+from weather_send.notify import send_pushover_notification
+from weather_send.segments import describe
 
-class Command(BaseCommand):
+class Command(MeasuredCommand):
     help = 'Fetches weather and UV index and sends an SMS'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--run', help='Name of this send in the delivery ledger (default: one per day)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue an earlier run, sending only to recipients it did not reach')
+
+    @span('fetch')
     def fetch_weather_and_uv(self):
-        weather_api_key = os.environ.get('WEATHER_API_KEY')
         lat = os.environ.get('LAT1')
         lon = os.environ.get('LON1')
-        one_call_url = f"https://api.openweathermap.org/data/3.0/onecall?lat={lat}&lon={lon}&exclude=current,minutely,hourly&appid={weather_api_key}&units=imperial"
 
         try:
-            one_call_data = requests.get(one_call_url).json()
-            today_forecast = one_call_data.get('daily', [{}])[0]
+            today_forecast = fetch_daily_forecast(lat, lon)
 
             if not today_forecast:
                 self.stdout.write(self.style.ERROR('Failed to fetch weather data.'))
-                return None, None, None, None, None
+                return None, None, None, None
 
             day_temperature = round(today_forecast.get('temp', {}).get('day', "N/A"))
             min_temperature = round(today_forecast.get('temp', {}).get('min', "N/A"))
@@ -30,32 +37,39 @@ class Command(BaseCommand):
 
         except requests.RequestException as e:
             self.stdout.write(self.style.ERROR(f"An error occurred while fetching data: {e}"))
-            return None, None, None, None, None
-
-    def send_sms(self, day_temperature, min_temperature, max_temperature, summary):
-        account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
-        auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
-        client = Client(account_sid, auth_token)
+            return None, None, None, None
 
+    @span('send')
+    def send_sms(self, day_temperature, min_temperature, max_temperature, summary, run):
         recipient_numbers = [os.environ.get('RECIPIENT_PHONE2')]
 
         body = (f"Good morning! Today's temperature is {day_temperature}°F, "
                 f"with a high of {max_temperature}°F and a low of {min_temperature}°F. "
                 f"{summary}.")
 
-        for number in recipient_numbers:
-            message = client.messages.create(
-                body=body,
-                from_=os.environ.get('TWILIO_PHONE'),
-                to=number
-            )
+        outcomes = send_batch(run, [(number, body, None) for number in recipient_numbers])
+        for delivery, result in outcomes:
+            if result is None and delivery.status == Delivery.SENT:
+                self.stdout.write(f"Already sent to {delivery.phone_number}.")
+            elif result is None:
+                self.stdout.write(self.style.WARNING(
+                    f"Skipped {delivery.phone_number}, an earlier attempt may have been sent: {delivery.error}"))
+            elif result.error:
+                self.stdout.write(self.style.ERROR(f"Failed to send to {result.to}: {result.error}"))
+            else:
+                self.stdout.write(f"Sent to {result.to} ({describe(body)}).")
 
-        send_pushover_notification(f"Daily update: {body}")
+        if any(result and not result.error for _, result in outcomes):
+            send_pushover_notification(f"Daily update: {body}")
 
     def handle(self, *args, **kwargs):
+        run = kwargs['run'] or default_run('send_text2')
+        if run_exists(run) and not kwargs['resume']:
+            raise CommandError(f"Run {run} was already sent; pass --resume to retry only its undelivered recipients.")
+
         day_temperature, min_temperature, max_temperature, summary = self.fetch_weather_and_uv()
         if all([day_temperature, min_temperature, max_temperature, summary]):
-            self.send_sms(day_temperature, min_temperature, max_temperature, summary)
+            self.send_sms(day_temperature, min_temperature, max_temperature, summary, run)
             self.stdout.write(self.style.SUCCESS('Successfully sent weather and UV index information.'))
         else:
             self.stdout.write(self.style.ERROR('Failed to fetch weather and UV index data.'))
\ No newline at end of file
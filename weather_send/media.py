@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.urls import reverse
+from importlib.util import find_spec
+from io import BytesIO
+from urllib.parse import urljoin
+from .http_client import get_session
+from .image_cache import ImageCache
+from .metrics import span
+import hashlib
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+MAX_DOWNLOAD_BYTES = 25 * 1024 * 1024
+
+# JPEG qualities tried at each size before scaling down again.
+JPEG_QUALITIES = (85, 75, 65, 50)
+SCALE_STEP = 0.75
+MIN_DIMENSION = 240
+
+meme_cache = ImageCache(settings.MEME_CACHE_DIR, settings.MEME_CACHE_MAX_BYTES, suffix='.jpg', name='meme')
+
+
+def transcoding_available():
+    # Opt-in, as the web process has to serve what the sending command wrote.
+    # Pillow is optional, and Twilio can only fetch the result from a public address.
+    return settings.MEME_TRANSCODE and bool(settings.PUBLIC_BASE_URL) and find_spec('PIL') is not None
+
+
+def meme_key(url, max_bytes):
+    return hashlib.sha256(f"{max_bytes}|{url}".encode('utf-8')).hexdigest()
+
+
+def download(url):
+    # Returns the image's bytes and content type.
+    with get_session('meme_images').get(url, stream=True) as response:
+        response.raise_for_status()
+        data = bytearray()
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            data += chunk
+            if len(data) > MAX_DOWNLOAD_BYTES:
+                raise ValueError(f"{url} is over {MAX_DOWNLOAD_BYTES} bytes")
+        return bytes(data), response.headers.get('Content-Type', '')
+
+
+@span('transcode')
+def fit_image(data, max_bytes):
+    # Returns a JPEG of at most max_bytes, recompressing and then scaling down
+    # as needed. Only memes over max_bytes are passed in, so an animated GIF
+    # that fits is never flattened; one that doesn't keeps only its first
+    # frame. Returns None if even the smallest size allowed doesn't fit.
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(data)) as image:
+        if (image.format == 'JPEG' and len(data) <= max_bytes
+                and max(image.size) <= settings.MEME_MAX_DIMENSION):
+            return data
+        image.seek(0)
+        frame = ImageOps.exif_transpose(image)
+        if frame.mode in ('RGBA', 'LA', 'P'):
+            # JPEG has no transparency, so flatten onto white.
+            frame = frame.convert('RGBA')
+            background = Image.new('RGB', frame.size, 'white')
+            background.paste(frame, mask=frame.getchannel('A'))
+            frame = background
+        else:
+            frame = frame.convert('RGB')
+    frame.thumbnail((settings.MEME_MAX_DIMENSION, settings.MEME_MAX_DIMENSION), Image.LANCZOS)
+
+    while True:
+        for quality in JPEG_QUALITIES:
+            output = BytesIO()
+            frame.save(output, 'JPEG', quality=quality, optimize=True)
+            if output.tell() <= max_bytes:
+                return output.getvalue()
+        width, height = frame.size
+        if min(width, height) * SCALE_STEP < MIN_DIMENSION:
+            return None
+        frame = frame.resize((round(width * SCALE_STEP), round(height * SCALE_STEP)), Image.LANCZOS)
+
+
+def optimized_meme_url(url, max_bytes, data=None):
+    # Fits the meme to max_bytes and returns the address this site serves the
+    # result from. The meme is downloaded unless its bytes are passed in as
+    # data or a fitted copy is already cached. Raises if it can't be fetched
+    # or fitted.
+    def generate():
+        fitted = fit_image(data if data is not None else download(url)[0], max_bytes)
+        if fitted is None:
+            raise ValueError(f"{url} can't be made to fit in {max_bytes} bytes")
+        return fitted
+
+    key = meme_cache.get_or_create(meme_key(url, max_bytes), generate)
+    return urljoin(settings.PUBLIC_BASE_URL, reverse('meme_image', args=[key]))
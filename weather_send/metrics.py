@@ -0,0 +1,218 @@
+from contextlib import contextmanager
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+import math
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Content cache key of the metric totals persisted by management commands.
+PERSISTED_KEY = 'metrics:commands'
+PERSIST_LOCK_WAIT = 5
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def snapshot(self, reset=False):
+        with self.lock:
+            values = dict(self.values)
+            if reset:
+                self.values = {}
+        return values
+
+    @staticmethod
+    def merge(values, other):
+        for key, value in other.items():
+            values[key] = values.get(key, 0) + value
+        return values
+
+    def render(self, values=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted((self.snapshot() if values is None else values).items()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[key] = (counts, total + value)
+
+    def snapshot(self, reset=False):
+        with self.lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self.values.items()}
+            if reset:
+                self.values = {}
+        return values
+
+    @staticmethod
+    def merge(values, other):
+        for key, (counts, total) in other.items():
+            if key in values:
+                merged, merged_total = values[key]
+                values[key] = ([a + b for a, b in zip(merged, counts)], merged_total + total)
+            else:
+                values[key] = (list(counts), total)
+        return values
+
+    def render(self, values=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted((self.snapshot() if values is None else values).items()):
+            for bound, count in zip(self.buckets, counts):
+                labels = format_labels(self.labelnames, key, [('le', format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+
+# Metrics are kept per process. Each web worker exposes its own, plus the
+# totals management commands have persisted to the shared content cache.
+stage_seconds = Histogram('weather_send_stage_seconds',
+                          'Time spent in each fetch, parse, render and send step.', ['stage'])
+provider_request_seconds = Histogram('weather_send_provider_request_seconds',
+                                     'Latency of outbound HTTP requests by provider.', ['provider'])
+provider_requests = Counter('weather_send_provider_requests_total',
+                            'Outbound HTTP requests by provider and status code.', ['provider', 'status'])
+provider_retries = Counter('weather_send_provider_retries_total',
+                           'Outbound HTTP requests retried by provider.', ['provider'])
+provider_bytes = Counter('weather_send_provider_response_bytes_total',
+                         'Response bytes received from each provider.', ['provider'])
+cache_requests = Counter('weather_send_cache_requests_total',
+                         'Cache lookups by cache and result.', ['cache', 'result'])
+messages_sent = Counter('weather_send_messages_total',
+                        'Twilio messages submitted by result.', ['result'])
+message_segments = Counter('weather_send_message_segments_total',
+                           'Billable SMS segments submitted by encoding.', ['encoding'])
+
+breaker_events = Counter('weather_send_breaker_events_total',
+                         'Circuit breaker transitions, skipped calls and stale fallbacks by provider.',
+                         ['provider', 'event'])
+
+REGISTRY = [stage_seconds, provider_request_seconds, provider_requests, provider_retries,
+            provider_bytes, cache_requests, messages_sent, message_segments,
+            breaker_events]
+
+
+@contextmanager
+def span(stage):
+    # Usable as a context manager or a decorator.
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage=stage)
+
+
+def record_cache(cache, hit):
+    cache_requests.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def persist():
+    # Commands exit long before anything could scrape them, so they add what
+    # they've recorded since the last call to running totals kept in the
+    # shared content cache, which render() merges in. Returns the values added
+    # by metric name. A lock entry keeps concurrent commands from losing each
+    # other's updates; one held longer than PERSIST_LOCK_WAIT is ignored.
+    values = {metric.name: metric.snapshot(reset=True) for metric in REGISTRY}
+    cache = caches['content']
+    lock_key = f"{PERSISTED_KEY}:lock"
+    deadline = time.monotonic() + PERSIST_LOCK_WAIT
+    locked = cache.add(lock_key, True, PERSIST_LOCK_WAIT)
+    while not locked and time.monotonic() < deadline:
+        time.sleep(0.05)
+        locked = cache.add(lock_key, True, PERSIST_LOCK_WAIT)
+    try:
+        totals = cache.get(PERSISTED_KEY) or {}
+        for metric in REGISTRY:
+            totals[metric.name] = metric.merge(totals.get(metric.name, {}), values[metric.name])
+        cache.set(PERSISTED_KEY, totals, None)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return values
+
+
+def summary(values):
+    # A per-run table of time spent in each stage and provider, from the
+    # values persist() returns.
+    rows = [(stage, histogram) for (stage,), histogram in values[stage_seconds.name].items()]
+    rows += [(f"provider:{provider}", histogram)
+             for (provider,), histogram in values[provider_request_seconds.name].items()]
+    if not rows:
+        return []
+    lines = [f"  {'stage':<24}{'calls':>8}{'total':>10}   (ms)"]
+    for name, (counts, total) in sorted(rows):
+        lines.append(f"  {name:<24}{counts[-1]:>8}{total * 1000:>10.1f}")
+    return lines
+
+
+def render():
+    persisted = caches['content'].get(PERSISTED_KEY) or {}
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(metric.merge(metric.snapshot(), persisted.get(metric.name, {}))))
+    return '\n'.join(lines) + '\n'
+
+
+class MeasuredCommand(BaseCommand):
+    # Base for the commands that fetch and send. Once a run ends, however it
+    # ends, its metrics are persisted for the web workers to expose and
+    # summarised on stdout.
+    def execute(self, *args, **options):
+        try:
+            return super().execute(*args, **options)
+        finally:
+            self.report_metrics()
+
+    def report_metrics(self):
+        try:
+            lines = summary(persist())
+        except Exception as e:
+            self.stderr.write(f"Failed to persist metrics: {e}")
+            return
+        if lines:
+            self.stdout.write('\n'.join(lines))
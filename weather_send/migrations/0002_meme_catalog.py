@@ -0,0 +1,36 @@
+# Generated by Django 4.2.5 on 2026-10-18 09:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_send', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Meme',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500, unique=True)),
+                ('size', models.PositiveIntegerField(blank=True, null=True)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('first_seen', models.DateField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MemeDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(max_length=20)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('meme', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='weather_send.meme')),
+            ],
+            options={
+                'unique_together': {('meme', 'phone_number')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.5 on 2026-10-18 09:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_send', '0002_meme_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sender', models.CharField(max_length=20)),
+                ('role', models.CharField(max_length=20)),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sender', 'id'], name='weather_sen_sender_b60920_idx')],
+            },
+        ),
+    ]
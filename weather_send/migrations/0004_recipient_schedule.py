@@ -0,0 +1,25 @@
+# Generated by Django 4.2.5 on 2026-10-18 09:47
+
+import datetime
+from django.db import migrations, models
+import weather_send.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_send', '0003_conversation_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipient',
+            name='send_time',
+            field=models.TimeField(default=datetime.time(7, 0), help_text='Local time of the morning text'),
+        ),
+        migrations.AddField(
+            model_name='recipient',
+            name='timezone',
+            field=models.CharField(default='UTC', max_length=64, validators=[weather_send.models.validate_timezone]),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.5 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_send', '0004_recipient_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Delivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('run', models.CharField(db_index=True, max_length=200)),
+                ('phone_number', models.CharField(max_length=20)),
+                ('body_hash', models.CharField(max_length=64)),
+                ('sid', models.CharField(blank=True, max_length=34)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'deliveries',
+            },
+        ),
+    ]
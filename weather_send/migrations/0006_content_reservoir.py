@@ -0,0 +1,40 @@
+# Generated by Django 4.2.5 on 2026-10-18 09:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_send', '0005_delivery_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('fun_fact', 'Fun fact'), ('joke', 'Joke')], max_length=20)),
+                ('text', models.TextField()),
+                ('text_hash', models.CharField(max_length=64)),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'text_hash')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ContentDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(max_length=20)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='weather_send.contentitem')),
+            ],
+            options={
+                'verbose_name_plural': 'content deliveries',
+                'unique_together': {('item', 'phone_number')},
+            },
+        ),
+    ]
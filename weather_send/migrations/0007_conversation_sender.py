@@ -0,0 +1,31 @@
+# Generated by Django 4.2.5 on 2026-10-18 10:16
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def add_existing_senders(apps, schema_editor):
+    ConversationMessage = apps.get_model('weather_send', 'ConversationMessage')
+    ConversationSender = apps.get_model('weather_send', 'ConversationSender')
+    senders = ConversationMessage.objects.values('sender').annotate(last_active=Max('created_at'))
+    ConversationSender.objects.bulk_create(
+        [ConversationSender(sender=row['sender'], last_active=row['last_active']) for row in senders])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_send', '0006_content_reservoir'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationSender',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sender', models.CharField(max_length=20, unique=True)),
+                ('last_active', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.RunPython(add_existing_senders, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,126 @@
+from datetime import time
+from django.core.exceptions import ValidationError
 from django.db import models
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-# Create your models here.
+
+def validate_timezone(value):
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f"{value} is not a known timezone.")
+
+
+class Recipient(models.Model):
+    name = models.CharField(max_length=100)
+    phone_number = models.CharField(max_length=20, unique=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    active = models.BooleanField(default=True)
+    timezone = models.CharField(max_length=64, default='UTC', validators=[validate_timezone])
+    send_time = models.TimeField(default=time(7, 0), help_text="Local time of the morning text")
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.phone_number})"
+
+
+class Meme(models.Model):
+    url = models.URLField(max_length=500, unique=True)
+    size = models.PositiveIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    first_seen = models.DateField(auto_now_add=True)
+
+    def __str__(self):
+        return self.url
+
+
+class MemeDelivery(models.Model):
+    meme = models.ForeignKey(Meme, on_delete=models.CASCADE, related_name='deliveries')
+    phone_number = models.CharField(max_length=20)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('meme', 'phone_number')]
+
+    def __str__(self):
+        return f"{self.meme} -> {self.phone_number}"
+
+
+class ContentItem(models.Model):
+    FUN_FACT = 'fun_fact'
+    JOKE = 'joke'
+    KIND_CHOICES = [(FUN_FACT, 'Fun fact'), (JOKE, 'Joke')]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    text = models.TextField()
+    text_hash = models.CharField(max_length=64)
+    first_seen = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('kind', 'text_hash')]
+
+    def __str__(self):
+        return f"{self.kind}: {self.text[:50]}"
+
+
+class ContentDelivery(models.Model):
+    item = models.ForeignKey(ContentItem, on_delete=models.CASCADE, related_name='deliveries')
+    phone_number = models.CharField(max_length=20)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('item', 'phone_number')]
+        verbose_name_plural = 'content deliveries'
+
+    def __str__(self):
+        return f"{self.item} -> {self.phone_number}"
+
+
+class ConversationMessage(models.Model):
+    sender = models.CharField(max_length=20)
+    role = models.CharField(max_length=20)
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['sender', 'id'])]
+
+    def __str__(self):
+        return f"{self.sender} {self.role}: {self.content[:50]}"
+
+
+class ConversationSender(models.Model):
+    # When each sender last wrote, so the idlest can be found without
+    # scanning every message.
+    sender = models.CharField(max_length=20, unique=True)
+    last_active = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.sender
+
+
+class Delivery(models.Model):
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    # Hash of the run and recipient, so each recipient is sent to at most once per run.
+    key = models.CharField(max_length=64, unique=True)
+    run = models.CharField(max_length=200, db_index=True)
+    phone_number = models.CharField(max_length=20)
+    body_hash = models.CharField(max_length=64)
+    sid = models.CharField(max_length=34, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'deliveries'
+
+    def __str__(self):
+        return f"{self.run} -> {self.phone_number}: {self.status}"
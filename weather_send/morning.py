@@ -0,0 +1,413 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.db import close_old_connections
+import os
+import requests
+import random
+from datetime import datetime
+from weather_send.cache import cached_daily
+from weather_send.dispatch import send_message
+from weather_send.extract import charset, extract_holiday_title, extract_meme_urls
+from weather_send.http_client import get_session
+from weather_send.media import download, optimized_meme_url, transcoding_available
+from weather_send.metrics import MeasuredCommand, span
+from weather_send.models import ContentDelivery, Meme, MemeDelivery
+from weather_send.reservoir import fun_facts, jokes
+from weather_send.segments import describe, fit_sections
+from weather_send.weather import fetch_daily_forecast
+from weather_send.notify import send_pushover_notification
+
+PAGE_CHUNK_SIZE = 16 * 1024
+
+OPENERS = [
+    "Rise and shine, {recipient_name}! The world isn't going to take over itself! 🌞",
+    "Hey {recipient_name}, the early bird gets the worm, but the second mouse gets the cheese! 🧀",
+    "Good morning, {recipient_name}! The universe called; it wants its awesome back! 🌌",
+    "Hey {recipient_name}, time to wake up and smell the possibility! Or is that coffee? ☕",
+    "Yo, {recipient_name}! Time to rise and... ugh, I can't even, but you should! 💤",
+    "Top of the morning to you, {recipient_name}! Or bottom, depending on your sleep schedule. ⏰",
+    "Morning, {recipient_name}! The bed may be your temple, but it's time to leave the sanctuary! 🛏️",
+    "Hey {recipient_name}, ready to chase those dreams? You've got to wake up first! 🌠",
+    "Hello, {recipient_name}! Your bed might miss you, but your coffee maker is jealous! ☕",
+    "Up and at 'em, {recipient_name}! Your destiny isn’t going to fulfill itself! 🚀",
+    "Hey {recipient_name}, you're one in a melon! Time to rise and be fruitful! 🍉",
+    "Good morning, {recipient_name}! Time to beast, feast, and not be the least! 🦁",
+    "Hey {recipient_name}, you snooze, you lose! But coffee can help you win again! ⏰",
+    "Morning, {recipient_name}! Time to get up and doughnut the impossible! 🍩",
+    "Good morning, {recipient_name}! Wakey, wakey, eggs and... is that bacon I smell? 🍳",
+    "Hey {recipient_name}, rise and whine... just kidding, please don't whine! 😄",
+    "Whoa, {recipient_name}, you're up? I was just about to send the search party! 🕵️‍♂️",
+    "Morning, {recipient_name}! The bed's loss is the world's gain! 🌍",
+    "Hello, {recipient_name}! You're the 'avocado' to my 'toast' of good mornings! 🥑",
+    "Hey {recipient_name}, why did the human get out of bed? To read my message, of course! 🐔",
+    "Good morning, {recipient_name}! May your day be more fruitful than a basket of puppies! 🐶",
+    "Hey {recipient_name}, up yet? Your couch said it misses you but told you to go be productive first! 🛋️",
+    "Hey {recipient_name}, why did the chicken join a band? Because it had the drumsticks! Now, get up and rock your day! 🐔🥁",
+    "Morning, {recipient_name}! The aliens just called, they’re missing their leader. Beam up and take charge! 👽",
+    "Good morning, {recipient_name}! Ever tried to catch fog? Don't bother, I heard it's mist-ifying! 😂",
+    "Hey {recipient_name}, heard you've been knighted! Arise, Sir Laze-a-lot! ⚔️",
+    "Yo, {recipient_name}! Ever read a book on anti-gravity? It's impossible to put down, just like you! 📚",
+    "Morning, {recipient_name}! Wanna hear a construction joke? Oh, never mind, I'm still building it. Get up and build your day! 🏗️",
+    "Hey {recipient_name}, what did one wall say to the other? 'I'll meet you at the corner!' Time to turn your day around! 🏠",
+    "Good morning, {recipient_name}! How does Moses make his coffee? Hebrews it! Time to part your Red Sea of blankets! 🌊",
+    "Hey {recipient_name}, did you hear about the kidnapping at the playground? He woke up! Just like you need to! 😴",
+    "Morning, {recipient_name}! Why did the scarecrow win an award? Because he was outstanding in his field, just like you'll be today! 🌾",
+    "Hey {recipient_name}, what did one ocean say to the other? Nothing, they just waved. Time to make waves today! 🌊",
+    "Morning, {recipient_name}! What did the janitor say when he jumped out of the closet? 'Supplies!' Time to supply your awesomeness to the world! 🎉",
+    "Yo, {recipient_name}! What do you call fake spaghetti? An 'Impasta'! No faking today, rise and shine! 🍝",
+    "Hey {recipient_name}, what did one plate say to another plate? 'Lunch is on me!' Your day's on you, make it great! 🍽️",
+    "Good morning, {recipient_name}! Why did the golfer bring two pairs of pants? In case he got a hole in one. You got this one! ⛳"
+]
+
+
+class MorningTextCommand(MeasuredCommand):
+    help = 'Fetches weather and UV index and sends an SMS'
+
+    # Environment variables holding this recipient's details; set by each send_textN command.
+    lat_env = None
+    lon_env = None
+    phone_env = None
+    name_env = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Meme URL -> the recompressed copy this site serves in its place.
+        self.media_urls = {}
+
+    def media_url(self, meme_url):
+        return self.media_urls.get(meme_url, meme_url)
+
+    @span('fetch_weather')
+    def fetch_weather_and_uv(self, lat, lon):
+        try:
+            today_forecast = fetch_daily_forecast(lat, lon)
+            print(today_forecast)
+
+            if not today_forecast:
+                self.stdout.write(self.style.ERROR('Failed to fetch weather data.'))
+                return None, None, None, None
+
+            day_temperature = round(today_forecast['temp']['day'])
+            min_temperature = round(today_forecast['temp']['min'])
+            max_temperature = round(today_forecast['temp']['max'])
+            summary = today_forecast['summary']
+
+            return day_temperature, min_temperature, max_temperature, summary
+
+        except requests.RequestException as e:
+            self.stdout.write(self.style.ERROR(f"An error occurred while fetching data: {e}"))
+            return None, None, None, None
+
+    @span('fetch_fun_fact')
+    def fetch_random_fun_fact_from_api(self, phone_numbers=()):
+        return fun_facts.take(phone_numbers, self.request_fun_facts)
+
+    def request_fun_facts(self):
+        limit = settings.FUN_FACT_BATCH_SIZE
+        api_url = 'https://api.api-ninjas.com/v1/facts?limit={}'.format(limit)
+        ninja_api_key = os.environ.get('NINJA_API_KEY')
+
+        if not ninja_api_key:
+            self.stdout.write(self.style.ERROR("NINJA_API_KEY not set in environment variables"))
+            return None
+
+        try:
+            response = get_session('api_ninjas').get(api_url, headers={'X-Api-Key': ninja_api_key})
+            if response.status_code == requests.codes.ok:
+                facts = response.json()
+                return [fact['fact'] for fact in facts if fact.get('fact')]
+            else:
+                self.stdout.write(self.style.ERROR(f"Error fetching fun facts: {response.status_code} {response.text}"))
+                return None
+        except requests.RequestException as e:
+            self.stdout.write(self.style.ERROR(f"An error occurred while fetching fun facts: {e}"))
+            return None
+
+    @span('fetch_memes')
+    def fetch_meme_candidates(self):
+        return cached_daily('memedroid', self.scrape_meme_candidates)
+
+    @span('scrape_memedroid')
+    def scrape_meme_candidates(self):
+        MEMEDROID_URL = "https://www.memedroid.com/memes/top/day"
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+        }
+
+        try:
+            with get_session('memedroid').get(MEMEDROID_URL, headers=headers, stream=True) as response:
+                if response.status_code != 200:
+                    self.stdout.write(
+                        self.style.ERROR(f"Failed to fetch Memedroid page. Status code: {response.status_code}"))
+                    return None
+                meme_urls = extract_meme_urls(response.iter_content(chunk_size=PAGE_CHUNK_SIZE),
+                                              charset(response.headers.get('Content-Type', '')))
+            if not meme_urls:
+                self.stdout.write(self.style.ERROR('No memes found.'))
+                return None
+            return meme_urls
+        except requests.RequestException as e:
+            self.stdout.write(self.style.ERROR(f"An error occurred while fetching meme: {e}"))
+            return None
+
+    def fetch_meme_info(self, meme_url):
+        try:
+            response = get_session('meme_images').head(meme_url, allow_redirects=True)
+            content_type = response.headers.get('Content-Type', '')
+            content_length = response.headers.get('Content-Length')
+            if content_length is None:
+                # Some hosts leave Content-Length off HEAD responses; a one-byte
+                # ranged GET reports the full size in Content-Range instead.
+                response = get_session('meme_images').get(meme_url, headers={'Range': 'bytes=0-0'}, stream=True)
+                response.close()
+                content_type = content_type or response.headers.get('Content-Type', '')
+                content_range = response.headers.get('Content-Range', '')
+                if response.status_code == 206 and not content_range.endswith('/*'):
+                    content_length = content_range.rsplit('/', 1)[-1]
+                elif response.status_code == 200:
+                    content_length = response.headers.get('Content-Length')
+            if content_length is None:
+                self.stdout.write(self.style.ERROR(f"Could not determine the size of {meme_url}."))
+                return None, content_type
+            return int(content_length), content_type  # Size in bytes
+        except (requests.RequestException, ValueError) as e:
+            self.stdout.write(self.style.ERROR(f"An error occurred while fetching meme size: {e}"))
+            return None, ''
+
+    @span('fetch_holiday')
+    def fetch_holiday(self):
+        # A past day's holiday would be wrong today, so it's left out instead.
+        return cached_daily('holiday', self.scrape_holiday, stale=False, provider='holidaycalendar')
+
+    @span('scrape_holiday')
+    def scrape_holiday(self):
+        try:
+            with get_session('holidaycalendar').get("https://www.holidaycalendar.io/what-holiday-is-today", stream=True) as response:
+                if response.status_code == 200:
+                    # Stops reading the page as soon as the title has been seen.
+                    holiday_title = extract_holiday_title(response.iter_content(chunk_size=PAGE_CHUNK_SIZE),
+                                                          charset(response.headers.get('Content-Type', '')))
+                    if holiday_title is not None:
+                        return holiday_title
+                    else:
+                        self.stdout.write(self.style.ERROR('Could not find h3 tag with the specific class.'))
+                else:
+                    self.stdout.write(self.style.ERROR('Failed to fetch the webpage.'))
+        except requests.RequestException as e:
+            self.stdout.write(self.style.ERROR(f"An error occurred while fetching holiday: {e}"))
+        return None
+
+    @span('fetch_joke')
+    def fetch_joke(self, phone_numbers=()):
+        return jokes.take(phone_numbers, self.request_jokes)
+
+    def request_jokes(self):
+        joke_api_url = f"https://v2.jokeapi.dev/joke/Any?amount={settings.JOKE_BATCH_SIZE}"
+        joke_strings = []
+
+        try:
+            response = get_session('jokeapi').get(joke_api_url)
+            if response.status_code == 200:
+                joke_data = response.json()
+                # A batch comes back as a list; a single joke, without one.
+                for joke in joke_data.get('jokes', [joke_data]):
+                    if joke.get('type') == 'twopart':
+                        joke_strings.append(f"{joke['setup']} ... {joke['delivery']}")
+                    elif joke.get('type') == 'single':
+                        joke_strings.append(joke['joke'])
+                return joke_strings
+            else:
+                self.stdout.write(self.style.ERROR('Failed to fetch the joke.'))
+        except requests.RequestException as e:
+            self.stdout.write(self.style.ERROR(f"An error occurred while fetching joke: {e}"))
+
+        return None
+
+    @span('send')
+    def send_sms(self, phone_number, body, meme_url, items=()):
+        result = send_message(phone_number, body, self.media_url(meme_url))
+        if not result.error:
+            if meme_url:
+                self.record_meme_delivery(meme_url, phone_number)
+            self.record_content_delivery(items, phone_number)
+        return result
+
+    def record_meme_delivery(self, meme_url, phone_number):
+        meme, _ = Meme.objects.get_or_create(url=meme_url)
+        MemeDelivery.objects.get_or_create(meme=meme, phone_number=phone_number)
+
+    def record_content_delivery(self, items, phone_number):
+        ContentDelivery.objects.bulk_create(
+            [ContentDelivery(item=item, phone_number=phone_number) for item in items], ignore_conflicts=True)
+
+    @span('fetch')
+    def fetch_content(self, locations, phone_numbers=()):
+        # Every provider is independent, so fetch them all at once and wait for
+        # the slowest one instead of paying for each round-trip in turn. Weather
+        # is fetched once per distinct location. The fun fact and joke come
+        # from their reservoirs, new to every one of phone_numbers; the items
+        # picked are kept in content['items'] to be recorded once sent.
+        fetchers = {
+            'meme_urls': self.fetch_meme_candidates,
+            'holiday': self.fetch_holiday,
+            'fun_fact': lambda: self.fetch_random_fun_fact_from_api(phone_numbers),
+            'joke': lambda: self.fetch_joke(phone_numbers),
+        }
+        for lat, lon in set(locations):
+            fetchers[('weather', lat, lon)] = lambda lat=lat, lon=lon: self.fetch_weather_and_uv(lat, lon)
+
+        content = dict.fromkeys(fetchers)
+        content['weather'] = {}
+        for lat, lon in locations:
+            content['weather'][(lat, lon)] = (None, None, None, None)
+
+        def run(fetcher):
+            # Each worker thread gets its own database connection; close it
+            # rather than leave it open for the rest of the process.
+            try:
+                return fetcher()
+            finally:
+                close_old_connections()
+
+        executor = ThreadPoolExecutor(max_workers=len(fetchers))
+        futures = {executor.submit(run, fetcher): name for name, fetcher in fetchers.items()}
+        done, not_done = wait(futures, timeout=settings.MORNING_FETCH_TIMEOUT)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        for future in done:
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"An error occurred while fetching {name}: {e}"))
+                continue
+            if isinstance(name, tuple):
+                content['weather'][name[1:]] = result
+            else:
+                content[name] = result
+        for future in not_done:
+            self.stdout.write(self.style.ERROR(f"Timed out while fetching {futures[future]}."))
+
+        for name in fetchers:
+            if isinstance(name, tuple):
+                del content[name]
+
+        content['items'] = [content[name] for name in ('fun_fact', 'joke') if content[name] is not None]
+        for name in ('fun_fact', 'joke'):
+            content[name] = content[name] and content[name].text
+        return content
+
+    @span('render')
+    def render_body(self, recipient_name, content, weather, day=None):
+        day_temperature, min_temperature, max_temperature, summary = weather
+        if not all([day_temperature, min_temperature, max_temperature, summary]):
+            return None
+
+        random_opener = random.choice(OPENERS).format(recipient_name=recipient_name)
+        today_date_readable = (day or datetime.now()).strftime('%B %d, %Y')
+
+        head = (f"📆 Today is {today_date_readable}. \n"
+                f"{random_opener} \n"
+                f"Here's your daily scoop:\n"
+                f"🌡️ The day's looking to be about {day_temperature}°F. Expect highs of {max_temperature}°F and lows around {min_temperature}°F.\n"
+                f"☀️ Weather's saying: {summary}.\n")
+        # Optional sections in order of priority; missing ones are left out.
+        sections = [
+            f"🎉 And guess what? It's {content['holiday']} today! \n" if content.get('holiday') else '',
+            f"🤓 Fun Fact of the Day: {content['fun_fact']}.\n" if content.get('fun_fact') else '',
+            f"😂 Joke of the Day: {content['joke']}.\n" if content.get('joke') else '',
+        ]
+        tail = f"Make it a great one, {recipient_name}!"
+        return fit_sections(head, [section for section in sections if section], tail, settings.MORNING_MAX_SEGMENTS)
+
+    @span('meme_fit')
+    def find_fitting_meme(self, body, meme_urls, phone_numbers):
+        text_size = len(body.encode('utf-8'))
+        size_budget = settings.MMS_MAX_SIZE_MB * 1024 * 1024 - text_size
+
+        # Today's candidates join the catalog so their sizes are only ever probed once.
+        meme_urls = meme_urls or []
+        Meme.objects.bulk_create([Meme(url=url) for url in meme_urls], ignore_conflicts=True)
+        memes = Meme.objects.filter(url__in=meme_urls).exclude(deliveries__phone_number__in=phone_numbers)
+        memes = list(memes)
+        random.shuffle(memes)
+
+        if transcoding_available():
+            # Any candidate will do. One known to be small enough is sent as it
+            # is. Otherwise each is downloaded once, its size recorded, and sent
+            # as it is if it fits after all; only one that doesn't is
+            # recompressed, from the bytes already downloaded.
+            target = min(size_budget, settings.MEME_TARGET_KB * 1024)
+            for meme in memes:
+                if meme.size is not None and meme.size <= target:
+                    return meme.url
+            for meme in memes:
+                try:
+                    data = None
+                    if meme.size is None:
+                        data, meme.content_type = download(meme.url)
+                        meme.size = len(data)
+                        meme.save(update_fields=['size', 'content_type'])
+                        if meme.size <= target:
+                            return meme.url
+                    self.media_urls[meme.url] = optimized_meme_url(meme.url, target, data)
+                    return meme.url
+                except (requests.RequestException, ValueError, OSError) as e:
+                    self.stdout.write(self.style.ERROR(f"Failed to optimize meme {meme.url}: {e}"))
+
+        for meme in memes:
+            if meme.size is not None and meme.size < size_budget:
+                return meme.url
+
+        # Probe the unknown sizes at once and take the first fit in candidate
+        # order. Once one is found, only probes that already finished are
+        # recorded; the rest are left for a later run.
+        unprobed = [meme for meme in memes if meme.size is None][:settings.MEME_MAX_PROBES]
+        if unprobed:
+            executor = ThreadPoolExecutor(max_workers=len(unprobed))
+            probes = [(meme, executor.submit(self.fetch_meme_info, meme.url)) for meme in unprobed]
+            executor.shutdown(wait=False)
+
+            fitting_url = None
+            for meme, probe in probes:
+                if fitting_url and not probe.done():
+                    continue
+                meme.size, meme.content_type = probe.result()
+                if meme.size is None:
+                    continue
+                meme.save(update_fields=['size', 'content_type'])
+                if fitting_url is None and meme.size < size_budget:
+                    print(f"Combined size (in MB) for URL {meme.url}: {(meme.size + text_size) / (1024 * 1024)}")
+                    fitting_url = meme.url
+            if fitting_url:
+                return fitting_url
+
+        # Nothing from today fits, so fall back to the newest catalogued meme
+        # that does and that these recipients haven't seen.
+        meme = (Meme.objects.filter(size__lt=size_budget)
+                .exclude(deliveries__phone_number__in=phone_numbers)
+                .order_by('-first_seen').first())
+        return meme.url if meme else None
+
+    def handle(self, *args, **kwargs):
+        lat = os.environ.get(self.lat_env)
+        lon = os.environ.get(self.lon_env)
+        phone_number = os.environ.get(self.phone_env)
+        recipient_name = os.environ.get(self.name_env)
+
+        content = self.fetch_content([(lat, lon)], [phone_number])
+        body = self.render_body(recipient_name, content, content['weather'][(lat, lon)])
+
+        if body:
+            send_pushover_notification(f"Daily Update for {recipient_name}: {body}")
+
+            meme_url = self.find_fitting_meme(body, content['meme_urls'], [phone_number])
+            if meme_url:
+                result = self.send_sms(phone_number, body, meme_url, content['items'])
+                if result.error:
+                    self.stdout.write(self.style.ERROR(f"Failed to send: {result.error}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"Successfully sent ({describe(body, meme_url)})."))
+                return
+
+            self.stdout.write(self.style.ERROR('Unable to find a suitable meme that fits within the size limit.'))
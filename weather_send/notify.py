@@ -0,0 +1,75 @@
+from django.conf import settings
+from weather_send.http_client import get_session
+import atexit
+import os
+import threading
+import time
+
+PUSHOVER_URL = "https://api.pushover.net/1/messages.json"
+PUSHOVER_MAX_LENGTH = 1024
+
+
+class PushoverNotifier:
+    # Notifications are queued and sent from a background thread, so callers
+    # never wait on Pushover. Everything queued within one window goes out as a
+    # single digest.
+    def __init__(self, window):
+        self.window = window
+        self.pending = []
+        self.condition = threading.Condition()
+        self.send_lock = threading.Lock()
+        self.thread = None
+
+    def notify(self, message):
+        with self.condition:
+            self.pending.append(message)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='pushover-notifier', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+            time.sleep(self.window)
+            self.flush()
+
+    def flush(self):
+        with self.send_lock:
+            with self.condition:
+                messages, self.pending = self.pending, []
+            if messages:
+                self.send(messages)
+
+    def send(self, messages):
+        if len(messages) == 1:
+            title, message = None, messages[0]
+        else:
+            title, message = f"{len(messages)} updates", "\n\n".join(messages)
+        if len(message) > PUSHOVER_MAX_LENGTH:
+            message = message[:PUSHOVER_MAX_LENGTH - 1] + "…"
+
+        pushover_payload = {
+            "token": os.environ.get('PUSHOVER_APP_TOKEN'),
+            "user": os.environ.get('PUSHOVER_USER_KEY'),
+            "message": message
+        }
+        if title:
+            pushover_payload["title"] = title
+        try:
+            response = get_session('pushover').post(PUSHOVER_URL, data=pushover_payload)
+            if response.status_code != 200:
+                print(f"Failed to send Pushover notification. Error: {response.text}")
+        except Exception as e:
+            print(f"Failed to send Pushover notification. Error: {e}")
+
+
+notifier = PushoverNotifier(settings.PUSHOVER_DIGEST_WINDOW)
+# Management commands exit as soon as they finish; send whatever is still queued.
+atexit.register(notifier.flush)
+
+
+def send_pushover_notification(message):
+    notifier.notify(message)
@@ -0,0 +1,53 @@
+from collections import OrderedDict
+from django.conf import settings
+from .metrics import record_cache
+import hashlib
+import json
+import re
+import threading
+import time
+
+
+def normalize_prompt(prompt):
+    prompt = re.sub(r'\s+', ' ', prompt.strip().lower())
+    return prompt.rstrip('.!?')
+
+
+def context_fingerprint(messages):
+    encoded = json.dumps([(m['role'], m['content']) for m in messages], ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+class ReplyCache:
+    # Size-bounded LRU of chat replies with a time-to-live, so common texts
+    # like "thanks" or "hi" are answered without another model call.
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, prompt, context):
+        return f"{normalize_prompt(prompt)}|{context_fingerprint(context)}"
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                record_cache('reply', hit=False)
+                return None
+            self.entries.move_to_end(key)
+            record_cache('reply', hit=True)
+            return entry[0]
+
+    def set(self, key, reply):
+        with self.lock:
+            self.entries[key] = (reply, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+reply_cache = ReplyCache(settings.REPLY_CACHE_MAX_ENTRIES, settings.REPLY_CACHE_TTL)
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db import close_old_connections
+from weather_send.breaker import CircuitBreaker, OPEN
+from weather_send.metrics import record_cache
+from weather_send.models import ContentItem
+import hashlib
+import threading
+
+
+def text_hash(text):
+    return hashlib.sha256(text.strip().encode('utf-8')).hexdigest()
+
+
+class Reservoir:
+    # A stock of fun facts or jokes kept in the database. Items are fetched
+    # from the provider in batches and served instantly, skipping any already
+    # sent to the recipients at hand. Once fewer than low_water are left for
+    # them it's refilled in the background; only an empty reservoir makes the
+    # caller wait for the provider.
+    def __init__(self, kind, provider, low_water):
+        self.kind = kind
+        self.provider = provider
+        self.low_water = low_water
+        self.lock = threading.Lock()
+        self.refilling = None
+
+    def available(self, phone_numbers):
+        return (ContentItem.objects.filter(kind=self.kind)
+                .exclude(deliveries__phone_number__in=phone_numbers))
+
+    def take(self, phone_numbers, fetch_batch):
+        # fetch_batch returns a list of new item texts, or None on failure.
+        # Returns the ContentItem picked; the caller records a ContentDelivery
+        # once it's actually been sent, so a failed send leaves it available.
+        item = self.available(phone_numbers).order_by('?').first()
+        record_cache(self.kind, hit=item is not None)
+        if item is None:
+            self.refill(fetch_batch)
+            item = self.available(phone_numbers).order_by('?').first()
+            if item is None:
+                return None
+
+        if self.available(phone_numbers).count() < self.low_water:
+            self.refill_in_background(fetch_batch)
+        return item
+
+    def refill(self, fetch_batch):
+        # Only one refill per reservoir runs at a time in this process.
+        with self.lock:
+            breaker = CircuitBreaker(self.provider)
+            if breaker.allow() == OPEN:
+                return
+            texts = breaker.call(fetch_batch) or []
+            items = {text_hash(text): text.strip() for text in texts if text and text.strip()}
+            ContentItem.objects.bulk_create(
+                [ContentItem(kind=self.kind, text=text, text_hash=key) for key, text in items.items()],
+                ignore_conflicts=True)
+
+    def refill_in_background(self, fetch_batch):
+        if self.refilling is not None and self.refilling.is_alive():
+            return
+
+        def run():
+            try:
+                self.refill(fetch_batch)
+            except Exception as e:
+                print(f"Failed to refill the {self.kind} reservoir. Error: {e}")
+            finally:
+                close_old_connections()
+
+        # Not a daemon thread, so a command finishing its sends still waits
+        # for the refill to land instead of cutting it off.
+        self.refilling = threading.Thread(target=run, name=f"refill-{self.kind}")
+        self.refilling.start()
+
+
+fun_facts = Reservoir(ContentItem.FUN_FACT, 'api_ninjas', settings.RESERVOIR_LOW_WATER)
+jokes = Reservoir(ContentItem.JOKE, 'jokeapi', settings.RESERVOIR_LOW_WATER)
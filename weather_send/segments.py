@@ -0,0 +1,105 @@
+from collections import namedtuple
+
+# GSM 03.38 default alphabet, and the extension table whose characters take
+# an escape septet as well.
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENSION = set("^{}\\[~]|€\f")
+
+# Units per message when the body fits in one, and per part once it needs a
+# concatenation header.
+SINGLE_LIMITS = {'GSM-7': 160, 'UCS-2': 70}
+PART_LIMITS = {'GSM-7': 153, 'UCS-2': 67}
+
+# Look-alikes that silently force UCS-2, swapped for their GSM-7 equivalents.
+GSM7_REPLACEMENTS = str.maketrans({
+    '\u2018': "'", '\u2019': "'", '\u201a': "'", '\u201c': '"', '\u201d': '"', '\u201e': '"',
+    '\u2013': '-', '\u2014': '-', '\u2212': '-', '\u2022': '-', '\u2026': '...',
+    '\u00a0': ' ', '\u2009': ' ', '\u200b': '',
+})
+
+SegmentInfo = namedtuple('SegmentInfo', ['encoding', 'units', 'segments'])
+
+
+def is_gsm7(text):
+    return all(char in GSM7_BASIC or char in GSM7_EXTENSION for char in text)
+
+
+def char_units(char, encoding):
+    if encoding == 'GSM-7':
+        return 2 if char in GSM7_EXTENSION else 1
+    return 2 if ord(char) > 0xFFFF else 1
+
+
+def analyze(body):
+    # Works out the encoding and how many billable segments the body takes.
+    # Escape sequences and surrogate pairs are never split across parts.
+    encoding = 'GSM-7' if is_gsm7(body) else 'UCS-2'
+    units = sum(char_units(char, encoding) for char in body)
+    if units <= SINGLE_LIMITS[encoding]:
+        return SegmentInfo(encoding, units, 1 if body else 0)
+
+    part_limit = PART_LIMITS[encoding]
+    segments, used = 1, 0
+    for char in body:
+        size = char_units(char, encoding)
+        if used + size > part_limit:
+            segments, used = segments + 1, 0
+        used += size
+    return SegmentInfo(encoding, units, segments)
+
+
+def normalize(text):
+    return text.translate(GSM7_REPLACEMENTS)
+
+
+def fit_sections(head, optional, tail='', max_segments=None):
+    # Builds head + optional sections + tail, keeping each optional section,
+    # in priority order, only if the body still fits in max_segments. Kept
+    # sections stay in their original order.
+    if not max_segments:
+        return head + ''.join(optional) + tail
+
+    kept = set()
+    for i in range(len(optional)):
+        candidate = kept | {i}
+        body = head + ''.join(optional[j] for j in sorted(candidate)) + tail
+        if analyze(body).segments <= max_segments:
+            kept = candidate
+    return head + ''.join(optional[j] for j in sorted(kept)) + tail
+
+
+def truncate_to_segments(text, max_segments, ellipsis='...'):
+    # Cuts text at a word boundary so it fits in max_segments, marking the cut.
+    if not max_segments or analyze(text).segments <= max_segments:
+        return text
+
+    encoding = analyze(text).encoding
+    if encoding == 'GSM-7' and not is_gsm7(ellipsis):
+        ellipsis = '...'
+    limit = (SINGLE_LIMITS if max_segments == 1 else PART_LIMITS)[encoding] * max_segments
+    budget = limit - sum(char_units(char, encoding) for char in ellipsis)
+
+    used, end = 0, 0
+    for i, char in enumerate(text):
+        used += char_units(char, encoding)
+        if used > budget:
+            break
+        end = i + 1
+    cut = text[:end]
+    if ' ' in cut[len(cut) // 2:]:
+        cut = cut[:cut.rindex(' ')]
+    # Part boundaries can waste a unit or two, so trim until it really fits.
+    while cut and analyze(cut.rstrip(' ,;:-') + ellipsis).segments > max_segments:
+        cut = cut[:-1]
+    return cut.rstrip(' ,;:-') + ellipsis
+
+
+def describe(body, media_url=None):
+    info = analyze(body)
+    segments = f"{info.segments} {info.encoding} segment{'s' if info.segments != 1 else ''}"
+    # With media attached the text goes out as one MMS; the segments show what
+    # it would cost on its own.
+    return f"MMS, body {segments}" if media_url else segments
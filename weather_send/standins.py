@@ -0,0 +1,214 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import base64
+import functools
+import json
+import random
+import struct
+import threading
+import time
+import uuid
+import zlib
+
+# Real host each stand-in replaces, keyed by the provider names used with
+# weather_send.http_client.get_session.
+PROVIDER_HOSTS = {
+    'openweather': 'api.openweathermap.org',
+    'api_ninjas': 'api.api-ninjas.com',
+    'jokeapi': 'v2.jokeapi.dev',
+    'memedroid': 'www.memedroid.com',
+    'meme_images': 'images.memedroid.com',
+    'holidaycalendar': 'www.holidaycalendar.io',
+    'twilio': 'api.twilio.com',
+    'pushover': 'api.pushover.net',
+    'openai': 'api.openai.com',
+}
+
+MEME_COUNT = 12
+
+
+def png(width, height, rng=None):
+    # White, or noise that barely compresses when rng is given.
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    rows = b''.join(b'\x00' + (rng.randbytes(width * 3) if rng else b'\xff' * width * 3) for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+
+def tiny_png():
+    return png(1, 1)
+
+
+@functools.lru_cache(maxsize=None)
+def meme_image():
+    return png(256, 256, random.Random(0))
+
+
+def daily_forecast(days=8):
+    today = int(time.time()) // 86400 * 86400 + 12 * 3600
+    return [{
+        'dt': today + day * 86400,
+        'temp': {'day': 70.4 + day, 'min': 58.2 + day, 'max': 77.9 + day},
+        'summary': 'Expect a day of partly cloudy with clear spells',
+    } for day in range(days)]
+
+
+def memedroid_page():
+    articles = ''.join(
+        f'<article class="gallery-item"><header><a href="/memes/detail/{i}">Meme {i}</a></header>'
+        f'<picture><img class="img-responsive" src="https://images.memedroid.com/images/standin/{i}.jpeg" '
+        f'alt="Meme {i}"></picture><p>{"Comment. " * 50}</p></article>'
+        for i in range(MEME_COUNT))
+    return f'<html><head><title>Top memes</title></head><body>{articles}</body></html>'
+
+
+def holiday_page():
+    return ('<html><body><div class="card"><a href="/holiday">'
+            '<h3 class="card-link-title---hover-secondary-1">National Stand-In Day</h3></a></div>'
+            + '<div class="card"><p>Other holidays</p></div>' * 200 + '</body></html>')
+
+
+class StandInConfig:
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+
+    def delay(self):
+        return max(self.latency + random.uniform(-self.jitter, self.jitter), 0)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Answers every provider's endpoints with canned payloads shaped like the
+    # real ones, after the configured latency, failing some requests with a 503.
+    provider = None
+    config = None
+    requests_seen = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_HEAD(self):
+        self.handle_request('HEAD')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def handle_request(self, method):
+        started = time.perf_counter()
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        time.sleep(self.config.delay())
+
+        if random.random() < self.config.failure_rate:
+            self.respond(503, b'{"error": "injected failure"}', 'application/json', method)
+        else:
+            status, body, content_type, headers = self.payload(method)
+            self.respond(status, body, content_type, method, headers)
+        self.requests_seen.append((self.provider, (time.perf_counter() - started) * 1000))
+
+    def respond(self, status, body, content_type, method, headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        headers = headers or {}
+        if 'Content-Length' not in headers:
+            headers['Content-Length'] = str(len(body))
+        for name, value in headers.items():
+            if value is not None:
+                self.send_header(name, value)
+        self.end_headers()
+        if method != 'HEAD':
+            self.wfile.write(body)
+
+    def payload(self, method):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        provider = self.provider
+
+        if provider == 'openweather':
+            return 200, json.dumps({'daily': daily_forecast()}), 'application/json', None
+        if provider == 'api_ninjas':
+            limit = int(query.get('limit', ['1'])[0])
+            facts = [{'fact': f"Stand-in fact number {random.randint(1, 10 ** 6)}"} for _ in range(limit)]
+            return 200, json.dumps(facts), 'application/json', None
+        if provider == 'jokeapi':
+            amount = int(query.get('amount', ['1'])[0])
+            jokes = [{'type': 'single', 'joke': f"Stand-in joke {random.randint(1, 10 ** 6)}",
+                      'id': random.randint(1, 10 ** 6)} for _ in range(amount)]
+            if amount == 1:
+                return 200, json.dumps({'error': False, **jokes[0]}), 'application/json', None
+            return 200, json.dumps({'error': False, 'amount': amount, 'jokes': jokes}), 'application/json', None
+        if provider == 'memedroid':
+            return 200, memedroid_page(), 'text/html; charset=utf-8', None
+        if provider == 'meme_images':
+            image = meme_image()
+            # Odd-numbered memes leave Content-Length off HEAD responses to
+            # exercise the ranged GET fallback.
+            number = int(url.path.rsplit('/', 1)[-1].split('.')[0] or 0)
+            if method == 'HEAD' and number % 2:
+                return 200, b'', 'image/png', {'Content-Length': None}
+            if self.headers.get('Range'):
+                return 206, image[:1], 'image/png', {'Content-Range': f"bytes 0-0/{len(image)}"}
+            return 200, image, 'image/png', None
+        if provider == 'holidaycalendar':
+            return 200, holiday_page(), 'text/html; charset=utf-8', None
+        if provider == 'twilio':
+            if method == 'GET':
+                return 200, json.dumps({'messages': [], 'next_page_uri': None}), 'application/json', None
+            sid = 'SM' + uuid.uuid4().hex
+            return 201, json.dumps({'sid': sid, 'status': 'queued'}), 'application/json', None
+        if provider == 'pushover':
+            return 200, json.dumps({'status': 1, 'request': str(uuid.uuid4())}), 'application/json', None
+        if provider == 'openai':
+            if url.path.endswith('/images/generations'):
+                data = [{'b64_json': base64.b64encode(tiny_png()).decode('ascii')}]
+                return 200, json.dumps({'created': int(time.time()), 'data': data}), 'application/json', None
+            completion = {
+                'id': 'chatcmpl-standin', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': 'gpt-3.5-turbo',
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': 'A stand-in reply, delivered with comic timing.'}}],
+                'usage': {'prompt_tokens': 10, 'completion_tokens': 10, 'total_tokens': 20},
+            }
+            return 200, json.dumps(completion), 'application/json', None
+        return 404, b'', 'text/plain', None
+
+
+class StandIns:
+    # Runs one local server per provider. Use as a context manager; host_overrides
+    # maps each real host to its stand-in, ready for HTTP_HOST_OVERRIDES.
+    def __init__(self, configs=None, default=None):
+        configs = configs or {}
+        default = default or StandInConfig()
+        self.configs = {provider: configs.get(provider, default) for provider in PROVIDER_HOSTS}
+        self.requests_seen = []
+        self.servers = {}
+
+    def __enter__(self):
+        for provider, config in self.configs.items():
+            handler = type(f"{provider}Handler", (StandInHandler,), {
+                'provider': provider, 'config': config, 'requests_seen': self.requests_seen,
+            })
+            server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name=f"standin-{provider}", daemon=True).start()
+            self.servers[provider] = server
+        return self
+
+    def __exit__(self, *exc_info):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    @property
+    def host_overrides(self):
+        return {PROVIDER_HOSTS[provider]: f"http://127.0.0.1:{server.server_port}"
+                for provider, server in self.servers.items()}
@@ -1,3 +1,355 @@
-from django.test import TestCase
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from io import StringIO
+from twilio.base.exceptions import TwilioRestException
+from types import SimpleNamespace
+from unittest import mock
+from weather_send.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from weather_send.dispatch import SmsResult
+from weather_send.ledger import body_hash, send_batch, send_key
+from weather_send.management.commands.run_scheduler import Command as SchedulerCommand, next_send_time
+from weather_send.models import Delivery, Recipient
+from weather_send.segments import analyze, fit_sections, truncate_to_segments
+import requests
 
-# Create your tests here.
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'content': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'content'},
+}
+
+RECIPIENTS = {'RECIPIENT_PHONE1': '+15005550001', 'RECIPIENT_PHONE3': '+15005550003',
+              'RECIPIENT_PHONE4': '+15005550004'}
+
+
+class FakeSend:
+    # Stands in for dispatch.send_messages, accepting every message except
+    # those to a number in failing, which Twilio rejects, and timing_out, whose
+    # fate is unknown. Keeps the numbers it was given.
+    def __init__(self, failing=(), timing_out=()):
+        self.failing = failing
+        self.timing_out = timing_out
+        self.numbers = []
+
+    def __call__(self, messages):
+        results = []
+        for to, _, _ in messages:
+            self.numbers.append(to)
+            if to in self.failing:
+                results.append(SmsResult(to, None, TwilioRestException(400, '/Messages.json', 'Invalid number')))
+            elif to in self.timing_out:
+                results.append(SmsResult(to, None, requests.ReadTimeout('Read timed out')))
+            else:
+                results.append(SmsResult(to, f"SM{to[-4:]}", None))
+        return results
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DeliveryLedgerTests(TestCase):
+    run_name = 'test:run'
+    to = '+15005550001'
+    body = 'Good morning!'
+
+    def pending_delivery(self):
+        return Delivery.objects.create(key=send_key(self.run_name, self.to), run=self.run_name,
+                                       phone_number=self.to, body_hash=body_hash(self.body),
+                                       status=Delivery.PENDING)
+
+    def twilio_log(self, *bodies, created=None):
+        # Queued messages have no date_sent yet, so only date_created is set.
+        created = created or timezone.now()
+        messages = [SimpleNamespace(sid=f"SM{i}", body=body, date_created=created, date_sent=None)
+                    for i, body in enumerate(bodies)]
+        client = mock.Mock()
+        client.messages.list.return_value = messages
+        return mock.patch('weather_send.ledger.get_twilio_client', return_value=client)
+
+    def test_pending_found_in_twilio_log_is_not_resent(self):
+        self.pending_delivery()
+        send = FakeSend()
+        with self.twilio_log('Something else', self.body), mock.patch('weather_send.ledger.send_messages', send):
+            [(delivery, result)] = send_batch(self.run_name, [(self.to, self.body, None)])
+
+        self.assertIsNone(result)
+        self.assertEqual(send.numbers, [])
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, Delivery.SENT)
+        self.assertEqual(delivery.sid, 'SM1')
+
+    def test_pending_missing_from_twilio_log_is_resent(self):
+        self.pending_delivery()
+        send = FakeSend()
+        with self.twilio_log('Something else'), mock.patch('weather_send.ledger.send_messages', send):
+            [(delivery, result)] = send_batch(self.run_name, [(self.to, self.body, None)])
+
+        self.assertEqual(send.numbers, [self.to])
+        self.assertEqual(result.sid, 'SM0001')
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, Delivery.SENT)
+
+    def test_earlier_message_in_twilio_log_is_not_matched(self):
+        self.pending_delivery()
+        send = FakeSend()
+        with self.twilio_log(self.body, created=timezone.now() - timedelta(days=1)), \
+                mock.patch('weather_send.ledger.send_messages', send):
+            send_batch(self.run_name, [(self.to, self.body, None)])
+
+        self.assertEqual(send.numbers, [self.to])
+
+    def test_unclear_send_stays_pending_and_is_checked_before_resending(self):
+        with mock.patch('weather_send.ledger.send_messages', FakeSend(timing_out={self.to})):
+            [(delivery, result)] = send_batch(self.run_name, [(self.to, self.body, None)])
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, Delivery.PENDING)
+        self.assertIn('Read timed out', delivery.error)
+
+        send = FakeSend()
+        with self.twilio_log(self.body), mock.patch('weather_send.ledger.send_messages', send):
+            send_batch(self.run_name, [(self.to, self.body, None)])
+        self.assertEqual(send.numbers, [])
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, Delivery.SENT)
+
+    def test_pending_is_skipped_when_twilio_log_is_unavailable(self):
+        self.pending_delivery()
+        client = mock.Mock()
+        client.messages.list.side_effect = ConnectionError('Twilio is down')
+        send = FakeSend()
+        with mock.patch('weather_send.ledger.get_twilio_client', return_value=client), \
+                mock.patch('weather_send.ledger.send_messages', send):
+            [(delivery, result)] = send_batch(self.run_name, [(self.to, self.body, None)])
+
+        self.assertIsNone(result)
+        self.assertEqual(send.numbers, [])
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, Delivery.PENDING)
+        self.assertIn('Twilio is down', delivery.error)
+
+
+@override_settings(CACHES=TEST_CACHES)
+@mock.patch.dict('os.environ', RECIPIENTS)
+class CustomTextResumeTests(TestCase):
+    def call(self, failing=(), **kwargs):
+        # Runs custom_text and returns the numbers it sent to.
+        send = FakeSend(failing)
+        with mock.patch('weather_send.ledger.send_messages', send):
+            call_command('custom_text', 'Hello', run='test:custom', stdout=StringIO(), **kwargs)
+        return send.numbers
+
+    def test_rerun_without_resume_is_refused(self):
+        self.call()
+        with self.assertRaises(CommandError):
+            self.call()
+
+    def test_resume_resends_only_failed_recipients(self):
+        self.assertEqual(self.call(failing={'+15005550003'}),
+                         ['+15005550001', '+15005550003', '+15005550004'])
+        self.assertEqual(Delivery.objects.get(phone_number='+15005550003').status, Delivery.FAILED)
+
+        self.assertEqual(self.call(resume=True), ['+15005550003'])
+        self.assertEqual(set(Delivery.objects.values_list('status', flat=True)), {Delivery.SENT})
+
+    def test_resume_of_completed_run_sends_nothing(self):
+        self.call()
+        self.assertEqual(self.call(resume=True), [])
+
+
+class SegmentTests(SimpleTestCase):
+    def test_analyze_boundaries(self):
+        cases = [
+            ('', 'GSM-7', 0),
+            ('a' * 160, 'GSM-7', 1),
+            ('a' * 161, 'GSM-7', 2),
+            ('a' * 306, 'GSM-7', 2),
+            ('a' * 307, 'GSM-7', 3),
+            ('€' * 80, 'GSM-7', 1),
+            ('€' * 81, 'GSM-7', 2),
+            ('°' * 70, 'UCS-2', 1),
+            ('°' * 71, 'UCS-2', 2),
+            ('😂' * 35, 'UCS-2', 1),
+            ('😂' * 36, 'UCS-2', 2),
+        ]
+        for body, encoding, segments in cases:
+            with self.subTest(body=body[:1], length=len(body)):
+                info = analyze(body)
+                self.assertEqual((info.encoding, info.segments), (encoding, segments))
+
+    def test_escape_sequence_is_not_split_across_parts(self):
+        # 152 units leave one in the first part, too few for the two-unit euro.
+        self.assertEqual(analyze('a' * 152 + '€' + 'a' * 152).segments, 3)
+
+    def test_truncate_leaves_fitting_text_alone(self):
+        self.assertEqual(truncate_to_segments('Short reply', 1), 'Short reply')
+        self.assertEqual(truncate_to_segments('word ' * 100, 0), 'word ' * 100)
+
+    def test_truncate_cuts_at_a_word_boundary(self):
+        for text, max_segments in [('word ' * 200, 1), ('word ' * 200, 3), ('mot° ' * 200, 2)]:
+            with self.subTest(encoding=analyze(text).encoding, max_segments=max_segments):
+                truncated = truncate_to_segments(text, max_segments)
+                self.assertLessEqual(analyze(truncated).segments, max_segments)
+                self.assertTrue(truncated.endswith('word...') or truncated.endswith('mot°...'))
+                self.assertTrue(text.startswith(truncated[:-3]))
+
+    def test_fit_sections_keeps_what_fits_in_priority_order(self):
+        head, tail = 'h' * 100, 't'
+        body = fit_sections(head, ['x' * 70, 'y' * 50, 'z' * 20], tail, max_segments=1)
+        self.assertEqual(body, head + 'y' * 50 + tail)
+        self.assertEqual(fit_sections(head, ['x' * 70], tail, max_segments=0), head + 'x' * 70 + tail)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CircuitBreakerTests(SimpleTestCase):
+    # 'test' has no HTTP_PROVIDERS entry, so it gets the defaults: three
+    # failures within 600 seconds open it for a 300 second cooldown.
+    def setUp(self):
+        caches['content'].clear()
+        self.now = 1000.0
+        # The locmem cache's expiry follows the same clock.
+        patcher = mock.patch('time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test')
+
+    def fail(self, times=1):
+        for _ in range(times):
+            self.breaker.record(False, 0.1)
+
+    def test_opens_after_threshold_failures(self):
+        self.fail(2)
+        self.assertEqual(self.breaker.allow(), CLOSED)
+        self.fail()
+        self.assertEqual(self.breaker.state(), OPEN)
+        self.assertEqual(self.breaker.allow(), OPEN)
+
+    def test_failures_outside_the_window_are_forgotten(self):
+        self.fail(2)
+        self.now += 601
+        self.fail()
+        self.assertEqual(self.breaker.state(), CLOSED)
+
+    def test_slow_success_counts_as_a_failure(self):
+        self.fail(2)
+        self.breaker.record(True, 9)
+        self.assertEqual(self.breaker.state(), OPEN)
+
+    def test_half_open_lets_one_trial_through(self):
+        self.fail(3)
+        self.now += 301
+        self.assertEqual(self.breaker.state(), HALF_OPEN)
+        self.assertEqual(self.breaker.allow(), HALF_OPEN)
+        self.assertEqual(CircuitBreaker('test').allow(), OPEN)
+
+    def test_successful_trial_closes(self):
+        self.fail(3)
+        self.now += 301
+        self.breaker.allow()
+        self.breaker.record(True, 0.1)
+        self.assertEqual(self.breaker.state(), CLOSED)
+        self.assertEqual(self.breaker.allow(), CLOSED)
+
+    def test_failed_trial_reopens_for_another_cooldown(self):
+        self.fail(3)
+        self.now += 301
+        self.breaker.allow()
+        self.fail()
+        self.assertEqual(self.breaker.state(), OPEN)
+        self.now += 301
+        self.assertEqual(self.breaker.allow(), HALF_OPEN)
+
+    def test_call_records_none_and_exceptions_as_failures(self):
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+        self.breaker.call(lambda: None)
+        self.breaker.call(lambda: None)
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(mock.Mock(side_effect=ConnectionError))
+        self.assertEqual(self.breaker.state(), OPEN)
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class NextSendTimeTests(SimpleTestCase):
+    # US clocks spring forward on 2026-03-08 and fall back on 2026-11-01.
+    def recipient(self, send_time=time(7, 0)):
+        return SimpleNamespace(timezone='America/New_York', send_time=send_time)
+
+    def test_follows_local_time_across_dst_changes(self):
+        recipient = self.recipient()
+        self.assertEqual(next_send_time(recipient, utc(2026, 3, 7, 0)), utc(2026, 3, 7, 12))
+        self.assertEqual(next_send_time(recipient, utc(2026, 3, 7, 13)), utc(2026, 3, 8, 11))
+        self.assertEqual(next_send_time(recipient, utc(2026, 10, 31, 12)), utc(2026, 11, 1, 12))
+
+    def test_time_skipped_by_dst_is_sent_an_hour_later(self):
+        self.assertEqual(next_send_time(self.recipient(time(2, 30)), utc(2026, 3, 8, 0)), utc(2026, 3, 8, 7, 30))
+
+    def test_send_time_itself_moves_to_the_next_day(self):
+        self.assertEqual(next_send_time(self.recipient(), utc(2026, 3, 7, 12)), utc(2026, 3, 8, 11))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SchedulerTests(TestCase):
+    def setUp(self):
+        self.ada = Recipient.objects.create(name='Ada', phone_number='+15005550001', latitude=40.7, longitude=-74.0,
+                                            timezone='America/New_York', send_time=time(7, 0))
+        self.grace = Recipient.objects.create(name='Grace', phone_number='+15005550003', latitude=40.7,
+                                              longitude=-74.0, timezone='Europe/London', send_time=time(7, 0))
+        self.output = StringIO()
+        self.scheduler = SchedulerCommand(stdout=self.output)
+        self.scheduler.lead = timedelta(minutes=10)
+        self.scheduler.recipients, self.scheduler.scheduled, self.scheduler.prepared = {}, {}, {}
+        self.scheduler.prefetch_queue, self.scheduler.send_queue = [], []
+
+    def test_pop_due_returns_recipients_once_their_time_comes(self):
+        scheduler = self.scheduler
+        scheduler.schedule(self.ada, utc(2026, 3, 7, 0))
+        send_at = utc(2026, 3, 7, 12)
+        self.assertEqual(scheduler.pop_due(scheduler.prefetch_queue, send_at - timedelta(minutes=11)), [])
+        self.assertEqual(scheduler.pop_due(scheduler.prefetch_queue, send_at - timedelta(minutes=10)), [self.ada.id])
+        self.assertEqual(scheduler.pop_due(scheduler.send_queue, send_at - timedelta(seconds=1)), [])
+        self.assertEqual(scheduler.pop_due(scheduler.send_queue, send_at), [self.ada.id])
+        self.assertEqual(scheduler.send_queue, [])
+
+    def test_rescheduled_entries_are_skipped(self):
+        scheduler = self.scheduler
+        scheduler.schedule(self.ada, utc(2026, 3, 7, 0))
+        self.ada.send_time = time(9, 0)
+        scheduler.schedule(self.ada, utc(2026, 3, 7, 0))
+        self.assertEqual(scheduler.pop_due(scheduler.send_queue, utc(2026, 3, 7, 12)), [])
+        self.assertEqual(scheduler.pop_due(scheduler.send_queue, utc(2026, 3, 7, 14)), [self.ada.id])
+
+    def test_failed_batch_is_logged_and_rescheduled_for_tomorrow(self):
+        scheduler = self.scheduler
+        scheduler.recipients = {self.ada.id: self.ada}
+        scheduler.schedule(self.ada, utc(2026, 3, 7, 0))
+        with mock.patch.object(scheduler, 'fetch_content', side_effect=OSError('Disk full')):
+            scheduler.guarded(scheduler.send_due, utc(2026, 3, 7, 12))
+
+        self.assertIn('Disk full', self.output.getvalue())
+        self.assertEqual(scheduler.scheduled[self.ada.id], utc(2026, 3, 8, 11))
+        self.assertEqual(scheduler.pop_due(scheduler.send_queue, utc(2026, 3, 8, 11)), [self.ada.id])
+
+    def test_invalid_timezone_skips_only_that_recipient(self):
+        Recipient.objects.filter(pk=self.grace.pk).update(timezone='Mars/Olympus_Mons')
+        self.scheduler.reload()
+        self.assertEqual(list(self.scheduler.scheduled), [self.ada.id])
+        self.assertIn("Can't schedule Grace", self.output.getvalue())
+
+
+@override_settings(CACHES=TEST_CACHES, SMS_DEFERRED_REPLY=True)
+class DeferredReplyTests(SimpleTestCase):
+    def test_reply_comes_from_the_number_messaged(self):
+        with mock.patch('weather_send.views.reply_executor') as executor, \
+                mock.patch('weather_send.views.send_pushover_notification'):
+            response = Client().post('/sms/', {'Body': 'hi', 'From': '+15005550001', 'To': '+15005550099'})
+        self.assertEqual(response.status_code, 200)
+        job, *args = executor.submit.call_args.args
+
+        with mock.patch('weather_send.views.build_reply', return_value='Hello!'), \
+                mock.patch('weather_send.views.send_message',
+                           return_value=SmsResult('+15005550001', 'SM1', None)) as send_message:
+            job(*args)
+        send_message.assert_called_once_with('+15005550001', 'Hello!', from_='+15005550099')
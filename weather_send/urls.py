@@ -1,6 +1,9 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 urlpatterns = [
     path('sms/', views.sms_reply, name='sms_reply'),
+    path('metrics/', views.metrics, name='metrics'),
+    re_path(r'^images/(?P<key>[0-9a-f]{64})\.png$', views.generated_image, name='generated_image'),
+    re_path(r'^memes/(?P<key>[0-9a-f]{64})\.jpg$', views.meme_image, name='meme_image'),
 ]
\ No newline at end of file
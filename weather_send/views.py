@@ -1,73 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
 from django.views.decorators.csrf import csrf_exempt
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import reverse
 from twilio.twiml.messaging_response import MessagingResponse
+from .chat_context import build_context
+from .conversations import build_conversation_store
+from .dispatch import send_message
+from .http_client import get_session, provider_timeout
+from .image_cache import image_cache
+from .media import meme_cache
+from .metrics import render, span
+from .notify import send_pushover_notification
+from .reply_cache import reply_cache
+from .segments import normalize, truncate_to_segments
+from urllib.parse import urljoin
+import base64
 import os
-import openai
-import requests
 
-openai.api_key = os.environ.get('OPENAI_API_KEY')
 ENGINE = "gpt-3.5-turbo"
 CUSTOM_REPLY_TRIGGER = os.environ.get('CUSTOM_REPLY_TRIGGER')
-conversations = []
+conversations = build_conversation_store()
+reply_executor = ThreadPoolExecutor(max_workers=settings.SMS_REPLY_WORKERS, thread_name_prefix='sms-reply')
+
+def load_openai():
+    # The openai package is by far the slowest import here, so workers only
+    # load it once they actually need a model reply.
+    import openai
+    openai.api_key = os.environ.get('OPENAI_API_KEY')
+    openai.requestssession = get_session('openai')
+    return openai
 
 @csrf_exempt
+@span('sms_reply')
 def sms_reply(request):
     user_message = request.POST.get("Body")
     sender_number = request.POST.get("From")
-
-    if user_message.strip().lower() == CUSTOM_REPLY_TRIGGER:
-        ai_reply = "Rude"
-    else:
-        ai_reply = generate_ai_response(user_message)
+    our_number = request.POST.get("To")
 
     notification_message = f"New message from {sender_number}: {user_message}"
     send_pushover_notification(notification_message)
 
+    # Generated images are served from this site, so replies need its address.
+    base_url = settings.PUBLIC_BASE_URL or request.build_absolute_uri('/')
+
     response = MessagingResponse()
-    response.message(ai_reply)
+    if settings.SMS_DEFERRED_REPLY:
+        # Acknowledge Twilio straight away and send the reply through the REST
+        # API once it's ready, so the webhook never waits on OpenAI. Like the
+        # TwiML reply, it comes from the number the message was sent to.
+        reply_executor.submit(send_deferred_reply, sender_number, user_message, base_url, our_number)
+    else:
+        response.message(build_reply(user_message, sender_number, base_url))
 
     return HttpResponse(str(response))
 
-def generate_ai_response(prompt):
+def build_reply(user_message, sender_number, base_url=None):
+    if user_message.strip().lower() == CUSTOM_REPLY_TRIGGER:
+        return "Rude"
+    return generate_ai_response(user_message, sender_number, base_url)
+
+def send_deferred_reply(sender_number, user_message, base_url=None, reply_from=None):
+    try:
+        ai_reply = build_reply(user_message, sender_number, base_url)
+    except Exception as e:
+        print(f"Failed to generate a reply for {sender_number}. Error: {e}")
+        return
+    finally:
+        # Reply threads outlive requests, so release their database connection.
+        close_old_connections()
+
+    result = send_message(sender_number, ai_reply, from_=reply_from)
+    if result.error:
+        print(f"Failed to send a reply to {sender_number}. Error: {result.error}")
+
+@span('ai_reply')
+def generate_ai_response(prompt, sender_number, base_url=None):
     if prompt.strip().lower().startswith("image "):
         image_prompt = prompt[6:].strip()  # Remove "image " from the prompt
-        return generate_dalle_image(image_prompt)
+        return generate_dalle_image(image_prompt, base_url=base_url)
+
+    history = conversations.history(sender_number)
+    context = history[-settings.REPLY_CACHE_CONTEXT_MESSAGES:] if settings.REPLY_CACHE_CONTEXT_MESSAGES else []
+    cache_key = reply_cache.key(prompt, context)
 
     user_message = {"role": "user", "content": prompt}
-    conversations.append(user_message)
+    conversations.append(sender_number, user_message)
+
+    cached_reply = reply_cache.get(cache_key)
+    if cached_reply is not None:
+        conversations.append(sender_number, {"role": "assistant", "content": cached_reply})
+        return cached_reply
 
     system_message = {"role": "system",
                       "content": "You are a funny helpful assistant who enjoys comedy."}
-    messages = [system_message] + conversations
-    messages = messages[-10:]
-
-    response = openai.ChatCompletion.create(
-        model=ENGINE,
-        messages=messages,
-        temperature=1.0
-    )
-
-    assistant_message = response.choices[0].message.content
-    conversations.append({"role": "assistant", "content": assistant_message.strip()})
-
-    return assistant_message.strip()
-
-def generate_dalle_image(prompt, size="1024x1024", n=1):
-    response = openai.Image.create(
-      prompt=prompt,
-      n=n,
-      size=size
-    )
-    image_url = response['data'][0]['url']
+    messages = build_context(system_message, history + [user_message])
+
+    with span('openai_chat'):
+        response = load_openai().ChatCompletion.create(
+            model=ENGINE,
+            messages=messages,
+            temperature=1.0,
+            request_timeout=provider_timeout('openai')
+        )
+
+    # Replies go out as plain SMS, so keep them to GSM-7 where possible and
+    # within the segment budget.
+    assistant_message = normalize(response.choices[0].message.content.strip())
+    assistant_message = truncate_to_segments(assistant_message, settings.SMS_REPLY_MAX_SEGMENTS)
+    conversations.append(sender_number, {"role": "assistant", "content": assistant_message})
+    reply_cache.set(cache_key, assistant_message)
+
+    return assistant_message
+
+def generate_dalle_image(prompt, size="1024x1024", n=1, base_url=None):
+    @span('openai_image')
+    def generate():
+        response = load_openai().Image.create(
+          prompt=prompt,
+          n=n,
+          size=size,
+          response_format="b64_json",
+          request_timeout=provider_timeout('openai')
+        )
+        return base64.b64decode(response['data'][0]['b64_json'])
+
+    # OpenAI's image URLs expire, so keep the bytes and link to our own copy.
+    key = image_cache.get_or_generate(prompt, size, generate)
+    image_url = urljoin(base_url or settings.PUBLIC_BASE_URL, reverse('generated_image', args=[key]))
     return image_url
 
-def send_pushover_notification(message):
-    pushover_url = "https://api.pushover.net/1/messages.json"
-    pushover_payload = {
-        "token": os.environ.get('PUSHOVER_APP_TOKEN'),
-        "user": os.environ.get('PUSHOVER_USER_KEY'),
-        "message": message
-    }
-    response = requests.post(pushover_url, data=pushover_payload)
-    if response.status_code != 200:
-        print(f"Failed to send Pushover notification. Error: {response.text}")
+def metrics(request):
+    # Per-process counters and histograms in the Prometheus text format.
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def generated_image(request, key):
+    path = image_cache.path(key)
+    if not path.exists():
+        raise Http404("Image not found")
+    return FileResponse(open(path, 'rb'), content_type='image/png')
+
+def meme_image(request, key):
+    path = meme_cache.path(key)
+    if not path.exists():
+        raise Http404("Meme not found")
+    return FileResponse(open(path, 'rb'), content_type='image/jpeg')
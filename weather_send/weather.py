@@ -0,0 +1,108 @@
+from datetime import datetime, timezone
+from django.conf import settings
+from django.core.cache import caches
+from weather_send.breaker import CircuitBreaker, CircuitOpen, OPEN
+from weather_send.http_client import get_session
+from weather_send.metrics import record_cache
+import os
+import requests
+import threading
+import time
+
+ONE_CALL_URL = "https://api.openweathermap.org/data/3.0/onecall"
+
+# A forecast is of no use once its last day has passed.
+FORECAST_TTL = 60 * 60 * 24 * 8
+
+_fetch_locks = {}
+_fetch_locks_guard = threading.Lock()
+
+
+def snap_to_grid(lat, lon, grid=None):
+    grid = grid or settings.WEATHER_GRID_DEGREES
+    snapped_lat = round(round(float(lat) / grid) * grid, 4)
+    snapped_lon = round(round(float(lon) / grid) * grid, 4)
+    return snapped_lat, snapped_lon
+
+
+def _fetch_lock(key):
+    with _fetch_locks_guard:
+        return _fetch_locks.setdefault(key, threading.Lock())
+
+
+def request_one_call(lat, lon):
+    weather_api_key = os.environ.get('WEATHER_API_KEY')
+    one_call_url = f"{ONE_CALL_URL}?lat={lat}&lon={lon}&exclude=current,minutely,hourly&appid={weather_api_key}&units=imperial"
+    breaker = CircuitBreaker('openweather')
+    if breaker.allow() == OPEN:
+        raise CircuitOpen("OpenWeather is failing; skipping it until its breaker closes.")
+    started = time.perf_counter()
+    try:
+        one_call_data = get_session('openweather').get(one_call_url).json()
+    except requests.RequestException:
+        breaker.record(False, time.perf_counter() - started)
+        raise
+    breaker.record(bool(one_call_data.get('daily')), time.perf_counter() - started)
+    return one_call_data
+
+
+def local_date(timestamp, timezone_offset):
+    return datetime.fromtimestamp(timestamp + timezone_offset, timezone.utc).date()
+
+
+def find_day(forecast, day=None):
+    # The forecast's entry for day, by default today at the forecast's location.
+    offset = forecast['timezone_offset']
+    day = day or local_date(time.time(), offset)
+    for entry in forecast['daily']:
+        if local_date(entry['dt'], offset) == day:
+            return entry
+    return None
+
+
+def fetch_daily_forecast(lat, lon, day=None):
+    # One Call returns eight days of daily forecast. The whole array is kept
+    # with the time it was fetched, and later days are served from it until
+    # it's older than WEATHER_FORECAST_MAX_AGE. Recipients whose coordinates
+    # snap to the same grid cell share it, so One Call usage grows with
+    # distinct locations, not recipients.
+    lat, lon = snap_to_grid(lat, lon)
+    key = f"forecast:{lat}:{lon}"
+    weather_cache = caches['content']
+
+    def lookup():
+        forecast = weather_cache.get(key)
+        if forecast is None:
+            return None, False
+        fresh = time.time() - forecast['issued_at'] <= settings.WEATHER_FORECAST_MAX_AGE
+        return find_day(forecast, day), fresh
+
+    entry, fresh = lookup()
+    record_cache('weather', hit=entry is not None and fresh)
+    if entry is not None and fresh:
+        return entry
+
+    # Concurrent lookups for the same cell in this process wait for the first
+    # request instead of issuing their own.
+    with _fetch_lock(key):
+        entry, fresh = lookup()
+        if entry is not None and fresh:
+            return entry
+
+        try:
+            one_call_data = request_one_call(lat, lon)
+        except requests.RequestException:
+            # An older forecast for the day beats none at all.
+            if entry is not None:
+                return entry
+            raise
+        if not one_call_data.get('daily'):
+            return entry
+
+        forecast = {
+            'issued_at': time.time(),
+            'timezone_offset': one_call_data.get('timezone_offset', 0),
+            'daily': one_call_data['daily'],
+        }
+        weather_cache.set(key, forecast, FORECAST_TTL)
+        return find_day(forecast, day)
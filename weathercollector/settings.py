@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -83,6 +84,23 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'content': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CONTENT_CACHE_DIR', BASE_DIR / '.cache' / 'content'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -124,3 +142,149 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+
+# Outbound HTTP
+# Per-provider overrides of weather_send.http_client.DEFAULT_PROVIDER_CONFIG:
+# connect_timeout, read_timeout (seconds), retries, backoff_factor, pool_maxsize,
+# max_retry_after (the longest Retry-After, in seconds, waited out before a retry),
+# and for the circuit breakers in weather_send.breaker, slow_call_seconds,
+# breaker_failures, breaker_window and breaker_cooldown (seconds).
+
+HTTP_PROVIDERS = {
+    'memedroid': {'read_timeout': 15, 'slow_call_seconds': 12},
+    'meme_images': {'pool_maxsize': int(os.environ.get('MEME_MAX_PROBES', 8))},
+    'pushover': {'retries': 1},
+    'openai': {'read_timeout': 60, 'retries': 1},
+    'twilio': {'read_timeout': 15, 'retries': 1},
+}
+
+# Send requests for a provider's host to another base URL instead, e.g.
+# {'api.openweathermap.org': 'http://127.0.0.1:8001'}.
+HTTP_HOST_OVERRIDES = {}
+
+
+# Twilio dispatch
+
+# Messages per second the sending number may submit (1 for a long code, more for
+# toll-free or short codes).
+TWILIO_MESSAGES_PER_SECOND = float(os.environ.get('TWILIO_MESSAGES_PER_SECOND', 1))
+
+# Concurrent requests to the Twilio API during a bulk send.
+TWILIO_DISPATCH_WORKERS = int(os.environ.get('TWILIO_DISPATCH_WORKERS', 8))
+
+# Attempts per message when Twilio answers 429 Too Many Requests.
+TWILIO_MAX_ATTEMPTS = int(os.environ.get('TWILIO_MAX_ATTEMPTS', 3))
+
+
+# Morning text
+
+# Seconds to wait for the slowest content provider before sending without it.
+MORNING_FETCH_TIMEOUT = float(os.environ.get('MORNING_FETCH_TIMEOUT', 20))
+
+# Seconds a day's shared content (holiday, meme candidates) stays cached.
+CONTENT_CACHE_TTL = int(os.environ.get('CONTENT_CACHE_TTL', 60 * 60 * 24))
+
+# Seconds the last good content from each provider is kept, to be served in
+# its place while the provider is failing.
+STALE_CONTENT_TTL = int(os.environ.get('STALE_CONTENT_TTL', 60 * 60 * 24 * 7))
+
+# Size in degrees of the grid cells coordinates are snapped to before fetching weather.
+# Recipients in the same cell share one forecast; 0.1 degrees is roughly 11 km.
+WEATHER_GRID_DEGREES = float(os.environ.get('WEATHER_GRID_DEGREES', 0.1))
+
+# Seconds a grid cell's eight-day forecast is served from before it's fetched
+# again. Lower it for fresher numbers, raise it for fewer One Call requests.
+WEATHER_FORECAST_MAX_AGE = int(os.environ.get('WEATHER_FORECAST_MAX_AGE', 60 * 60 * 24 * 3))
+
+# Twilio's MMS size limit for the body and attached meme combined.
+MMS_MAX_SIZE_MB = 5
+
+# Most SMS segments the morning body may take. The holiday, fun fact and joke
+# are kept, in that order of priority, only while the body still fits. 0 leaves
+# the body whole, as texts sent with a meme go out as one MMS whatever their length.
+MORNING_MAX_SEGMENTS = int(os.environ.get('MORNING_MAX_SEGMENTS', 0))
+
+# With MEME_TRANSCODE on, memes over MEME_TARGET_KB are downloaded and
+# recompressed, or scaled down, to fit it, and sent from this site instead;
+# otherwise oversized memes are skipped. Carriers often reject or degrade MMS
+# media over a few hundred KB. It also needs Pillow and PUBLIC_BASE_URL, and
+# the web process must read the same MEME_CACHE_DIR the sending commands write
+# to, so leave it off where they run on separate filesystems, as Heroku dynos do.
+MEME_TRANSCODE = os.environ.get('MEME_TRANSCODE', 'false').lower() in ('1', 'true', 'yes')
+MEME_TARGET_KB = int(os.environ.get('MEME_TARGET_KB', 600))
+
+# Longest side, in pixels, of a recompressed meme.
+MEME_MAX_DIMENSION = int(os.environ.get('MEME_MAX_DIMENSION', 1280))
+
+# Where recompressed memes are kept for Twilio to fetch, and how many bytes
+# before the least recently used are evicted. The web process serves them, so
+# it must share this directory with the commands that send.
+MEME_CACHE_DIR = os.environ.get('MEME_CACHE_DIR', BASE_DIR / '.cache' / 'memes')
+MEME_CACHE_MAX_BYTES = int(os.environ.get('MEME_CACHE_MAX_BYTES', 100 * 1024 * 1024))
+
+# Fun facts and jokes are fetched in batches of this many (the most api-ninjas
+# and JokeAPI return per request) and kept in the database.
+FUN_FACT_BATCH_SIZE = int(os.environ.get('FUN_FACT_BATCH_SIZE', 30))
+JOKE_BATCH_SIZE = int(os.environ.get('JOKE_BATCH_SIZE', 10))
+
+# Fewer unsent fun facts or jokes than this left for the recipients of a send
+# starts a background refill.
+RESERVOIR_LOW_WATER = int(os.environ.get('RESERVOIR_LOW_WATER', 10))
+
+# Most meme candidates to size-check, concurrently, when picking one that fits.
+MEME_MAX_PROBES = int(os.environ.get('MEME_MAX_PROBES', 8))
+
+# Minutes before a recipient's send time that run_scheduler fetches content and
+# prepares their text, leaving only the Twilio call for the send itself.
+SCHEDULER_PREFETCH_MINUTES = float(os.environ.get('SCHEDULER_PREFETCH_MINUTES', 10))
+
+# Seconds between run_scheduler reloads of recipients, picking up new ones and
+# changed send times.
+SCHEDULER_RELOAD_SECONDS = float(os.environ.get('SCHEDULER_RELOAD_SECONDS', 300))
+
+
+# Notifications
+
+# Seconds to collect Pushover notifications before sending them as one digest.
+PUSHOVER_DIGEST_WINDOW = float(os.environ.get('PUSHOVER_DIGEST_WINDOW', 5))
+
+
+# Inbound SMS
+
+# Answer the Twilio webhook with empty TwiML at once and send the AI reply
+# through the REST API when it's ready.
+SMS_DEFERRED_REPLY = os.environ.get('SMS_DEFERRED_REPLY', 'false').lower() in ('1', 'true', 'yes')
+
+# Threads per web worker generating deferred replies.
+SMS_REPLY_WORKERS = int(os.environ.get('SMS_REPLY_WORKERS', 4))
+
+# Most SMS segments an AI reply may take before it's cut at a word boundary.
+SMS_REPLY_MAX_SEGMENTS = int(os.environ.get('SMS_REPLY_MAX_SEGMENTS', 4))
+
+# Where chat histories live: 'memory' (per web worker) or 'database' (shared by
+# every worker through the default database).
+CONVERSATION_STORE = os.environ.get('CONVERSATION_STORE', 'memory')
+
+# Messages kept per sender, and senders kept before the idlest is forgotten.
+CONVERSATION_MAX_MESSAGES = int(os.environ.get('CONVERSATION_MAX_MESSAGES', 20))
+CONVERSATION_MAX_SENDERS = int(os.environ.get('CONVERSATION_MAX_SENDERS', 500))
+
+# Chat replies are cached by normalized prompt plus a fingerprint of the last
+# REPLY_CACHE_CONTEXT_MESSAGES messages of the sender's history.
+REPLY_CACHE_MAX_ENTRIES = int(os.environ.get('REPLY_CACHE_MAX_ENTRIES', 1000))
+REPLY_CACHE_TTL = int(os.environ.get('REPLY_CACHE_TTL', 60 * 60))
+REPLY_CACHE_CONTEXT_MESSAGES = int(os.environ.get('REPLY_CACHE_CONTEXT_MESSAGES', 2))
+
+# Estimated tokens of history sent with each chat completion, and the length of
+# the summary that older turns are compacted into.
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get('CHAT_CONTEXT_TOKEN_BUDGET', 1500))
+CHAT_SUMMARY_MAX_CHARS = int(os.environ.get('CHAT_SUMMARY_MAX_CHARS', 600))
+
+# Public address of this site, used to link generated images in SMS replies.
+# When unset it is taken from the incoming webhook request.
+PUBLIC_BASE_URL = os.environ.get('PUBLIC_BASE_URL', '')
+
+# Where generated images are kept, and how many bytes before the least recently
+# used are evicted.
+IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', BASE_DIR / '.cache' / 'images')
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 200 * 1024 * 1024))